@@ -0,0 +1,204 @@
+import numpy as np
+import pygame
+
+from collections import OrderedDict
+
+# Base pictures, loaded from disk and scaled once per process.
+# Keys are (path, size)
+base_images = {}
+
+# Tinted copies of the base pictures, least recently used first.
+# Keys are (path, size, quantized color)
+tinted_images = OrderedDict()
+max_tinted_images = 512
+
+# Every tinted picture rotated to angle_buckets evenly spaced angles, least
+# recently used first. Keys are the same as tinted_images. Whole sets are
+# thrown out once they use more than max_rotated_bytes together
+rotated_images = OrderedDict()
+rotated_bytes = {}
+rotated_total = 0
+angle_buckets = 64
+max_rotated_bytes = 64 * 1024 * 1024
+
+# Gene colors are rounded to multiples of this before tinting, so creatures
+# with nearly the same color share one picture
+color_step = 8
+
+def load_base_image(path, size):
+    """
+    Returns the picture at path scaled to size. The file is only loaded and
+    decoded the first time, after that the same surface is returned.
+
+    Args:
+    - path (str): Path of the image file.
+    - size (tuple): Width and height to scale the picture to.
+
+    Returns:
+    - pygame.Surface: The scaled picture. Shared, so don't draw on it.
+    """
+    key = (path, size)
+    if key not in base_images:
+        picture = pygame.image.load(path).convert_alpha() # converting makes draw time faster I guess
+        base_images[key] = pygame.transform.scale(picture, size)
+    return base_images[key]
+
+def preload(images):
+    """
+    Loads base pictures ahead of time so creatures born later in the
+    simulation never have to read files. Needs the display to be set up.
+
+    Args:
+    - images (list): List of (path, size) tuples.
+
+    Returns:
+    - None
+    """
+    for path, size in images:
+        load_base_image(path, size)
+
+def quantize_color(color):
+    """
+    Rounds the red, green and blue parts of a color to the nearest multiple
+    of color_step. The alpha part is left alone.
+
+    Args:
+    - color (tuple): (red, green, blue, alpha) color.
+
+    Returns:
+    - tuple: The rounded color.
+    """
+    red, green, blue, alpha = color
+    return (
+        min(255, round(red / color_step) * color_step),
+        min(255, round(green / color_step) * color_step),
+        min(255, round(blue / color_step) * color_step),
+        alpha
+        )
+
+def tinted_image(path, size, color):
+    """
+    Returns the base picture tinted to color. The base pictures are white,
+    so multiplying by the color tints them. Tinted pictures are kept in a
+    least recently used cache of max_tinted_images entries.
+
+    Args:
+    - path (str): Path of the image file.
+    - size (tuple): Width and height to scale the picture to.
+    - color (tuple): (red, green, blue, alpha) color determined by the genes.
+
+    Returns:
+    - pygame.Surface: The tinted picture. Shared, so don't draw on it.
+    """
+    color = quantize_color(color)
+    key = (path, size, color)
+    if key in tinted_images:
+        tinted_images.move_to_end(key)
+        return tinted_images[key]
+
+    picture = load_base_image(path, size).copy()
+    picture.fill(color, special_flags=pygame.BLEND_MULT)
+    tinted_images[key] = picture
+    if len(tinted_images) > max_tinted_images:
+        tinted_images.popitem(last=False)
+    return picture
+
+def set_angle_buckets(buckets):
+    """
+    Changes how many angles the pictures are pre-rotated to. More buckets
+    look smoother but use more memory. Clears the rotation cache.
+
+    Args:
+    - buckets (int): Number of angles, for example 64 or 128.
+
+    Returns:
+    - None
+    """
+    global angle_buckets, rotated_total
+    angle_buckets = buckets
+    rotated_images.clear()
+    rotated_bytes.clear()
+    rotated_total = 0
+
+def angle_bucket(angle):
+    """
+    Finds the pre-rotated angle closest to angle.
+
+    Args:
+    - angle (float): Angle in radians.
+
+    Returns:
+    - int: Index of the closest bucket, between 0 and angle_buckets - 1.
+    """
+    return int(round(angle / (2*np.pi) * angle_buckets)) % angle_buckets
+
+def rotated_image(path, size, color, bucket):
+    """
+    Returns the tinted picture rotated to the angle of bucket. Each color
+    gets a set of angle_buckets rotations that are filled in the first time
+    each angle is asked for and reused after that.
+
+    Args:
+    - path (str): Path of the image file.
+    - size (tuple): Width and height to scale the picture to.
+    - color (tuple): (red, green, blue, alpha) color determined by the genes.
+    - bucket (int): Angle bucket from angle_bucket.
+
+    Returns:
+    - pygame.Surface: The rotated picture. Shared, so don't draw on it.
+    """
+    global rotated_total
+    key = (path, size, quantize_color(color))
+    if key in rotated_images:
+        rotated_images.move_to_end(key)
+    else:
+        rotated_images[key] = [None] * angle_buckets
+        rotated_bytes[key] = 0
+
+    rotations = rotated_images[key]
+    if rotations[bucket] is None:
+        # rotozoom instead of rotate since it degrades the picture less
+        picture = tinted_image(path, size, color)
+        rotations[bucket] = pygame.transform.rotozoom(picture, bucket * 360 / angle_buckets, 1)
+        rotated_bytes[key] += surface_bytes(rotations[bucket])
+        rotated_total += surface_bytes(rotations[bucket])
+
+        # throws out the least recently used sets until under the memory
+        # limit, always keeping the one just used
+        while rotated_total > max_rotated_bytes and len(rotated_images) > 1:
+            old_key, _ = rotated_images.popitem(last=False)
+            rotated_total -= rotated_bytes.pop(old_key)
+
+    return rotations[bucket]
+
+def surface_bytes(surface):
+    """
+    Memory used by the pixels of a surface.
+
+    Args:
+    - surface (pygame.Surface): The surface.
+
+    Returns:
+    - int: Number of bytes.
+    """
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+def cache_report():
+    """
+    Describes how much memory the picture caches are using.
+
+    Args:
+    - None
+
+    Returns:
+    - str: One line summary of the caches.
+    """
+    base = sum(surface_bytes(surface) for surface in base_images.values())
+    tinted = sum(surface_bytes(surface) for surface in tinted_images.values())
+    rotations = sum(len(rotations) - rotations.count(None) for rotations in rotated_images.values())
+    return 'Picture cache: {} base ({:.1f} KB), {} tinted ({:.1f} KB), {} rotated in {} sets of {} angles ({:.1f} of {:.1f} MB)'.format(
+        len(base_images), base / 1024,
+        len(tinted_images), tinted / 1024,
+        rotations, len(rotated_images), angle_buckets,
+        rotated_total / 1024**2, max_rotated_bytes / 1024**2
+        )
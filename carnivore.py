@@ -1,10 +1,41 @@
 import numpy as np
 import pygame
+import rng
+
+from assets import angle_bucket, rotated_image, tinted_image
+from genetics import Phenotype, genes_to_array
+from spatial import buckets_of, cone_buckets, cone_stencil, square_stencil
 
 class Carnivore(pygame.sprite.Sprite):
     """
     Represents a predator in this simulation.
     """
+    # When True the creature is never drawn, so loading, tinting and
+    # rotating its picture is skipped. Set for headless runs
+    headless = False
+
+    # False while stepping frames that are never drawn, when the window
+    # fast forwards several frames at a time. The picture is only rotated
+    # and moved for frames that are shown
+    shown = True
+
+    # Only look through the hashing grid cells that could be in the field
+    # of view instead of every cell within view distance
+    cone_sensing = False
+
+    # Constants of the model. Class attributes so Simulation can change
+    # them for experiments, see sweep.py
+    maturity = 200 # creatures can't mate before maturity
+    litter_size = 1 # children per mating
+    hunt_threshold = 0.5 # starts hunting below this fraction of its max energy
+
+    # Death_Log every creature is recorded to when it dies, see records.py
+    death_log = None
+
+    # picture file and the size it's drawn at
+    picture_file = 'base-carnivore.png'
+    picture_size = (25, 25)
+
     def __init__(self, genes, x, y, orientation, hashing_grid):
         """
         Initialize a new instance of the predator agent.
@@ -14,7 +45,7 @@ class Carnivore(pygame.sprite.Sprite):
         - x (float): The x-coordinate of the predator's position.
         - y (float): The y-coordinate of the predator's position.
         - orientation (float): The angle of orientation of the predator.
-        - hashing_grid (numpy.ndarray): A 2D numpy array representing the grid used for hashing.
+        - hashing_grid (Spatial_Hash): The grid used for hashing.
         """
         super().__init__()
         # position information
@@ -22,48 +53,47 @@ class Carnivore(pygame.sprite.Sprite):
         self.normal = np.array([np.cos(self.angle), np.sin(self.angle)])
         self.pos = np.array([x, y])
 
-        # adding self to hashing grid
-        column = int(self.pos[0]/25)
-        row = int(self.pos[1]/25)
-        hashing_grid[row, column].append(self)
-
         # genome information
         self.genes = genes
-        self.color = [
-            round(np.mean(self.genes['red'])),
-            round(np.mean(self.genes['green'])),
-            round(np.mean(self.genes['blue'])),
-            100 # alpha channel
-            ]
-        
+        self.genome = genes_to_array(genes) # same genes as an array, used for reproduction
+        self.phenotype = Phenotype(self.genome) # expressed gene values, worked out once
+        self.color = self.phenotype.color
+        # hashing grid level it searches and how many of its cells it can see across
+        self.hash_level, self.view_cells = hashing_grid.level_for(self.phenotype.view_dist)
+
         # defining state variables
-        self.energy = np.mean(self.genes['max-energy']) # averaging value from both chromosomes
+        self.energy = self.phenotype.max_energy # averaging value from both chromosomes
         self.desire_to_mate = 0
         self.can_mate = False
         self.can_mate_counter = 0 # used as timer to determine when creature can mate again
         self.can_mate_counter_limit = 30
         self.dead = False
         self.ptype = 'predator'
-        self.sex = 0
-        if np.mean(self.genes['sex']) > 0:
-            self.sex = 1 # 1 = male
-        elif np.mean(self.genes['sex']) == 0:
-            self.sex = 0 # 0 = female
+        self.sex = self.phenotype.sex # 1 = male, 0 = female
+
+        # adding self to hashing grid, in the bucket of its species and sex
+        hashing_grid.insert(self)
         self.age = 0
-        self.max_age = np.random.randint(900, 1100)
-        self.maturity = 200 # creatures can't mate before maturity
+        self.max_age = rng.lifecycle.integers(900, 1100)
         
 
         # pygame drawing information
-        self.picture = pygame.image.load('base-carnivore.png').convert_alpha() # converting makes draw time faster I guess
-        self.picture = pygame.transform.scale(self.picture, (25, 25))
-        # base-herbivore.png is white so the next line
-        # tints it to the be color determined by it's genes
-        self.picture.fill(self.color, special_flags=pygame.BLEND_MULT)
-
-        self.image = self.rotate(self.picture, -self.angle)
-        self.rect = self.image.get_rect()
-        self.rect.center = [int(self.pos[0]), int(self.pos[1])]
+        if self.headless:
+            self.picture = None
+            self.image = None
+            self.rect = None
+        else:
+            # base picture is white and gets tinted to the color determined
+            # by it's genes. Tinted pictures are shared between creatures
+            # with the same color, see assets.py
+            self.picture = tinted_image(self.picture_file, self.picture_size, self.color)
+
+            # picture is drawn from pre-rotated copies, only swapped when
+            # the angle moves into a different bucket
+            self.angle_bucket = angle_bucket(-self.angle)
+            self.image = rotated_image(self.picture_file, self.picture_size, self.color, self.angle_bucket)
+            self.rect = self.image.get_rect()
+            self.rect.center = [int(self.pos[0]), int(self.pos[1])]
 
         # state machine
         """
@@ -75,63 +105,45 @@ class Carnivore(pygame.sprite.Sprite):
         self.hungry = False
         self.wander_counter = 0
         self.wander_counter_max = 500 # defines the counter for wandering in random direction
-        self.random_x = np.random.randint(10, 1290)
-        self.random_y = np.random.randint(10, 590)
+        self.random_x = rng.movement.integers(10, 1290)
+        self.random_y = rng.movement.integers(10, 590)
         self.target = None
-        self.neighbor_cells = []
-
-    def rotate(self, surface, angle):
-        """
-        This function exists because pygame's built in rotation functions
-        don't work well. They degrade the image quality and eventually
-        crash the program. See documentation for more information
-
-        Args:
-        - surface (pygame.Surface): The surface to be rotated.
-        - angle (float): The angle of rotation in radians.
-
-        Returns:
-        - pygame.Surface: The rotated surface.
-        """
-        rotated_surface = pygame.transform.rotozoom(surface, angle*180/np.pi, 1)
-        return rotated_surface
+        self.hash_cell = None
+        self.intent = None # what it decided to do this frame, see act
 
     def update_state(self, hashing_grid):
         """
         Update the state of the predator.
 
         Args:
-        - hashing_grid (numpy.ndarray): The spatial hashing grid used for neighbor detection.
+        - hashing_grid (Spatial_Hash): The spatial hashing grid used for neighbor detection.
 
         Returns:
         - None
         """
-        metabolism_rate = np.mean(self.genes["metabolism-rate"])
+        metabolism_rate = self.phenotype.metabolism_rate
         self.energy -= metabolism_rate
         if self.energy <= 0:
             self.dead = True
             return
 
-        find_mate_rate = np.mean(self.genes["find-mate-rate"])
+        find_mate_rate = self.phenotype.find_mate_rate
         self.desire_to_mate += find_mate_rate
-        max_desire = np.mean(self.genes["max-desire-to-mate"])
+        max_desire = self.phenotype.max_desire_to_mate
         if self.desire_to_mate >= max_desire:
             self.desire_to_mate = max_desire
 
-        self.max_energy = np.mean(self.genes["max-energy"])
+        self.max_energy = self.phenotype.max_energy
         hunger = self.max_energy - self.energy
 
         """
-        Gets position in spatial_hashing grid then finds neighbors
-        according to view distance.
-        neighbor_cells contains list of list of nearby creature objects
-        to loop through
+        Gets position in spatial_hashing grid. Neighbors are looked up
+        in act, only from the buckets of the species and sex being
+        searched for
         """
-        column = int(self.pos[0] / 25)
-        row = int(self.pos[1] / 25)
-        self.neighbor_cells = self.get_neighbor_values(row, column, hashing_grid)
+        self.hash_cell = hashing_grid.cell_of(self.pos, self.hash_level)
 
-        if hunger >= self.desire_to_mate and self.energy <= 0.5 * self.max_energy:
+        if hunger >= self.desire_to_mate and self.energy <= self.hunt_threshold * self.max_energy:
             self.state = 0
             self.hungry = True
 
@@ -153,7 +165,7 @@ class Carnivore(pygame.sprite.Sprite):
                     self.can_mate_counter += 1
 
 
-    def act(self, grid, dt, hashing_grid, group):
+    def act(self, dt, hashing_grid):
         """
         Performs an action based on the current state of the predator.
 
@@ -162,276 +174,152 @@ class Carnivore(pygame.sprite.Sprite):
         1 - Mating: Tries to reproduce with a mate.
         3 - Random Wander: Wanders around randomly.
         
+        Nothing outside the creature is changed here. Eating and mating
+        are saved in intent as ('graze', row, column), ('eat', prey) or
+        ('mate', mate) and carried out in Simulation.commit. The prey or
+        mate it goes after was already picked by Simulation.sense, see
+        search.
+
         Args:
-        - grid (numpy.ndarray): The grid of grass.
         - dt (float): The time step for the simulation.
-        - hashing_grid (numpy.ndarray): The hashing grid for spatial partitioning.
-        - group (pygame.sprite.Group): The sprite group of carnivores the creature belongs to.
+        - hashing_grid (Spatial_Hash): The hashing grid for spatial partitioning.
         """
+        self.intent = None
         if self.state == 0:
-            max_energy = np.mean(self.genes["max-energy"])
-            self.target = None
-            for cell in self.neighbor_cells:
-                for creature in cell:
-                    if creature.ptype == "prey":
-                        vec_to_creature = creature.pos - self.pos
-                        dist_to_creature = np.linalg.norm(vec_to_creature)
-                        fov = np.mean(self.genes["fov"]) / 2
-                        view_dist = np.mean(self.genes["view-dist"])
-
-                        if np.arccos(
-                            np.dot(vec_to_creature, self.normal) <= fov
-                            and dist_to_creature <= view_dist
-                        ):
-                            if self.target == None:
-                                self.target = creature
-                            else:
-                                current_nearest_dist = np.linalg.norm(
-                                    self.target.pos - self.pos
-                                )
-                                new_potential_dist = np.linalg.norm(creature.pos - self.pos)
-                                if current_nearest_dist < new_potential_dist:
-                                    self.target = creature
-
             if self.target != None:
                 self.look_at(self.target.pos, dt)
                 vec_to_target = self.target.pos - self.pos
                 dist_to_target = np.linalg.norm(vec_to_target)
                 if dist_to_target <= 40:
-                    self.energy += 200
-                    if self.energy >= max_energy:
-                        self.energy = max_energy
-                        self.hungry = False
-                    self.target.dead = True
+                    self.intent = ('eat', self.target)
 
             else:  # if no prey nearby, just wander around looking for one
                 if self.wander_counter % self.wander_counter_max == 0:
-                    self.random_x = np.random.randint(10, 1290)
-                    self.random_y = np.random.randint(10, 590)
-                    self.wander_counter_max = np.random.randint(100, 750)
+                    self.random_x = rng.movement.integers(10, 1290)
+                    self.random_y = rng.movement.integers(10, 590)
+                    self.wander_counter_max = rng.movement.integers(100, 750)
                 self.look_at(np.array([self.random_x, self.random_y]), dt)
             self.wander_counter += 1
 
         if self.state == 1:
             """
-            Look for mate within view distance
+            Target is the nearest mate in view, found by Simulation.sense
             If potential mate in view, move towards them
             If close enough and can mate and is old enough, request mate
             Female makes baby and adds it to creature_group
             """
-            nearest_potential_mate = None
-            for cell in self.neighbor_cells:
-                for creature in cell:
-                    if (
-                        creature != self
-                        and creature.sex != self.sex
-                        and creature.ptype == "predator"
-                    ):
-                        vec_to_creature = creature.pos - self.pos
-                        dist_to_creature = np.linalg.norm(vec_to_creature)
-                        vec_to_creature_norm = vec_to_creature / dist_to_creature
-                        fov = np.mean(self.genes["fov"]) / 2
-                        view_dist = np.mean(self.genes["view-dist"])
-
-                        if np.arccos(
-                            np.dot(vec_to_creature, self.normal) <= fov
-                            and dist_to_creature <= view_dist
-                        ):
-                            if nearest_potential_mate == None:
-                                nearest_potential_mate = creature
-                            else:
-                                current_nearest_dist = np.linalg.norm(
-                                    nearest_potential_mate.pos - self.pos
-                                )
-                                new_potential_dist = np.linalg.norm(creature.pos - self.pos)
-                                if current_nearest_dist < new_potential_dist:
-                                    nearest_potential_mate = creature
-
-            self.target = nearest_potential_mate
             if self.target != None:
                 self.look_at(self.target.pos, dt)
                 vec_to_target = self.target.pos - self.pos
                 dist_to_target = np.linalg.norm(vec_to_target)
                 if dist_to_target <= 10 and self.sex == 1 and self.can_mate:
-                    self.request_mate(self.target, hashing_grid, group)
+                    self.intent = ('mate', self.target)
                     self.desire_to_mate = 0
                     self.can_mate = False
                     self.state = 3
 
             else:  # if no potential mates nearby, just wander around looking for one
                 if self.wander_counter % self.wander_counter_max == 0:
-                    self.random_x = np.random.randint(10, 1290)
-                    self.random_y = np.random.randint(10, 590)
-                    self.wander_counter_max = np.random.randint(100, 750)
+                    self.random_x = rng.movement.integers(10, 1290)
+                    self.random_y = rng.movement.integers(10, 590)
+                    self.wander_counter_max = rng.movement.integers(100, 750)
                 self.look_at(np.array([self.random_x, self.random_y]), dt)
             self.wander_counter += 1
 
         if self.state == 3:  # wander state, same as everywhere else
             if self.wander_counter % self.wander_counter_max == 0:
-                self.random_x = np.random.randint(10, 1290)
-                self.random_y = np.random.randint(10, 590)
-                self.wander_counter_max = np.random.randint(100, 750)
+                self.random_x = rng.movement.integers(10, 1290)
+                self.random_y = rng.movement.integers(10, 590)
+                self.wander_counter_max = rng.movement.integers(100, 750)
             self.look_at(np.array([self.random_x, self.random_y]), dt)
             self.wander_counter += 1
 
 
-    def request_mate(self, mate, hashing_grid, group):
+    def eat_prey(self, prey):
         """
-        Sends a request to another predator to made
+        Eats the prey it was given by Simulation.commit and gains energy.
 
         Args:
-        - mate (Carnivore): The potential mate to request mating with.
-        - hashing_grid (numpy.ndarray): The hashing grid used for spatial partitioning.
-        - group (pygame.sprite.Group): The sprite group of carnivores this is a part of.
+        - prey (Herbivore): The prey that was caught.
 
         Returns:
         - None
         """
-        gamete = self.form_gamete()
-        mate.receive_request(self, gamete, hashing_grid, group)
+        self.energy += 200
+        max_energy = self.phenotype.max_energy
+        if self.energy >= max_energy:
+            self.energy = max_energy
+            self.hungry = False
+        prey.dead = True
 
-    def form_gamete(self):
+    def accept_mate(self):
         """
-        Creatures are haploid, so have 2 copies of each gene on 2 different
-        chromosomes. This function mimics "crossing over" in meisois
-        and returns a half complete set of genes that will be combined with
-        other parent's half set
-
-        Returns:
-        - dict: A dictionary representing a half complete set of genes.
-        """
-        haploid_cell = {
-            'speed': np.random.choice(self.genes['speed']),
-            'turn-speed': np.random.choice(self.genes['turn-speed']),
-            'fov': np.random.choice(self.genes['fov']),
-            'view-dist': np.random.choice(self.genes['view-dist']),
-            'max-energy': np.random.choice(self.genes['max-energy']),
-            'metabolism-rate': np.random.choice(self.genes['metabolism-rate']),
-            'find-mate-rate': np.random.choice(self.genes['find-mate-rate']),
-            'max-desire-to-mate': np.random.choice(self.genes['max-desire-to-mate']),
-            'sex': np.random.choice(self.genes['sex']),
-            'red': np.random.choice(self.genes['red']),
-            'green': np.random.choice(self.genes['green']),
-            'blue': np.random.choice(self.genes['blue'])
-            }
-
-        # defines different list of genes because some genes can't be mutated
-        # in the same way as others
-        mutations1 = ['speed','turn-speed','fov']
-        mutations2 = ['view-dist','max-energy','metabolism-rate','find-mate-rate','max-desire-to-mate']
-        mutations3 = ['sex']
-        mutations4 = ['red','green','blue']
-
-        # picks random key then applies mutation to it
-        mutation_chance = np.random.randint(1,5+1)
-        if mutation_chance > 4: # 20% chance of mutation
-            key = np.random.choice(list(haploid_cell.keys()))
-            if key in mutations1:
-                haploid_cell[key] += np.random.uniform(-2,2)
-            elif key in mutations2:
-                haploid_cell[key] = max(0, haploid_cell[key] + np.random.uniform(-2,2))
-            elif key in mutations3:
-                haploid_cell[key] = np.random.randint(0,2)
-            elif key in mutations4:
-                haploid_cell[key] = (haploid_cell[key] + np.random.randint(-10, 10)) % 256
-        
-        return haploid_cell
-
-    def receive_request(self, mate, paternal_gamete, hashing_grid, group):
-        """
-        If it's old enough and can mate and is in the find_mate state it will
-        form a gamete and pass the two sets of genes to the create_offspring
-        function
+        Called by Simulation.commit when a mate asks this creature to mate.
+        If it's old enough and can mate and is in the find_mate state it
+        accepts, and can't mate again until its rest period is over. The
+        children are made by Simulation.reproduce.
 
         Args:
-        - mate (Carnivore): The mate object that sent the mating request.
-        - paternal_gamete (dict): The paternal gamete containing half of the mate's genes.
-        - hashing_grid (numpy.ndarray):The hashing grid object for spatial organization.
-        - group (pygame.sprite.Group): The group of creatures to which both the creature and mate belong.
+        - None
+
+        Returns:
+        - bool: True if it accepted.
         """
         if self.age >= self.maturity and self.can_mate and self.state == 1:
-            maternal_gamete = self.form_gamete()
-            self.create_offspring(paternal_gamete, maternal_gamete, hashing_grid, group)
             self.desire_to_mate = 0
             self.can_mate = False
             self.state = 3
+            return True
+        return False
 
-    def create_offspring(self, p, m, hashing_grid, group):
-        """
-        Combines both sets of genes, creates a new Herbivore object,
-        and adds it to creature_group to start being drawn and updated
-
-        Args:
-        - p (dict): Paternal gamete containing genes from the father.
-        - m (dict): Maternal gamete containing genes from the mother.
-        - hashing_grid (numpy.ndarray): The hashing grid object for spatial organization.
-        - group (pygame.sprite.Group): The sprite group of creatures to which the offspring will be added.
-        """
-        genes = {
-            'speed': [p['speed'], m['speed']],
-            'turn-speed': [p['turn-speed'], m['turn-speed']],
-            'fov': [p['fov'], m['fov']],
-            'view-dist': [p['view-dist'], m['view-dist']],
-            'max-energy': [p['max-energy'], m['max-energy']],
-            'metabolism-rate': [p['metabolism-rate'], m['metabolism-rate']],
-            'find-mate-rate': [p['find-mate-rate'], m['find-mate-rate']],
-            'max-desire-to-mate': [p['max-desire-to-mate'], m['max-desire-to-mate']],
-            'sex': [p['sex'], m['sex']],
-            'red': [p['red'], m['red']],
-            'green': [p['green'], m['green']],
-            'blue': [p['blue'], m['blue']]
-            }
-        offspring = Carnivore(genes, self.pos[0]+1, self.pos[1]+1, self.angle, hashing_grid)
-        group.add(offspring)
-        
-    def on_board(self, x, y, grid):
+    def search(self, hashing_grid):
         """
-        Check if neighboring cells are within the bounds of the simulation.
+        Looks up the creatures it could go after this frame: prey within
+        view distance if it's hunting, or potential mates if it's looking
+        for one. Simulation.sense then picks the nearest one every creature
+        can see, for all of them at once, and saves it in target.
 
         Args:
-        - x (int): Row index.
-        - y (int): Column index.
-        - grid (numpy.ndarray): The grid to check against.
+        - hashing_grid (Spatial_Hash): The hashing grid to search.
 
         Returns:
-        - bool: True if neighboring cell is within the grid, False otherwise.
+        - list: The candidates, or None if it isn't searching.
         """
-        if x <= grid.shape[0] - 1 and x >= 0 and y <= grid.shape[1] - 1 and y >= 0:
-            return True
+        if self.state == 0:
+            buckets = buckets_of("prey")
+        elif self.state == 1:
+            buckets = buckets_of("predator", 1 - self.sex)
         else:
-            return False
+            return None
+        row, column = self.hash_cell
+        return self.get_neighbor_values(row, column, hashing_grid, buckets)
 
-    def get_neighbor_values(self, x, y, board):
+    def get_neighbor_values(self, x, y, board, buckets=None):
         """
         Code mostly from CMSE 201. Instead of checking immediate cell
         neighbors, the number of grid squares to search through is
-        calculated using the creature's view distance
+        calculated using the creature's view distance, at the hashing grid
+        level picked for it. The cells come from a cached stencil clipped to
+        the board (see spatial.py), and if
+        cone_sensing is on, cells outside the field of view are skipped
 
         Args:
-        - x (int): X-coordinate of the current cell.
-        - y (int): Y-coordinate of the current cell.
-        - board (numpy.ndarray): The grid to retrieve neighbor values from.
+        - x (int): Row of the current cell.
+        - y (int): Column of the current cell.
+        - board (Spatial_Hash): The hashing grid to retrieve neighbors from.
+        - buckets (tuple): Species and sex buckets to look in, from
+          buckets_of. Every bucket if None.
 
         Returns:
-        - list: List of values of neighboring cells on the grid.
+        - list: List of creatures in the neighboring cells.
         """
-        view_dist = np.mean(self.genes["view-dist"])
-        dist = int(np.ceil(view_dist / 25))
-
-        neighborhood = []
-        for row in range(2 * dist + 1):
-            for column in range(2 * dist + 1):
-                num_row = row - dist
-                num_column = column - dist
-                neighborhood.append((x + num_row, y + num_column))
-
-        # this code runs just like code from CMSE 201
-        neighbor_values = []
-        for neighbor in neighborhood:
-            if self.on_board(neighbor[0], neighbor[1], board):
-                neighbor_values.append(board[neighbor[0], neighbor[1]])
+        if self.cone_sensing:
+            direction, fov_width = cone_buckets(self.angle, self.phenotype.fov)
+            runs = cone_stencil(self.view_cells, direction, fov_width)
+        else:
+            runs = square_stencil(self.view_cells)
 
-        return neighbor_values
+        return board.query(x, y, runs, self.hash_level, buckets)
 
     def look_at(self, target, dt):
         """
@@ -457,73 +345,85 @@ class Carnivore(pygame.sprite.Sprite):
         # defines the creature's turn speed from it's genes, then
         # adds the angle to the creature's orientation angle to turn
         # it toward the target point
-        turn_speed = np.mean(self.genes["turn-speed"])
+        turn_speed = self.phenotype.turn_speed
         self.angle = self.angle + sign * turn_speed * dt
 
-    def update(self, grid, hashing_grid, dt, group):
+    def advance(self, hashing_grid, dt):
         """
-        Updates the state of the carnivore and its position based on its genes and environment.
+        Last phase of a frame, after every intent was carried out. Moves
+        the carnivore and ages it. If it died it's removed afterwards
+        by die.
 
         Args:
-        - grid (numpy.ndarray): The grid representing the environment and grass.
-        - hashing_grid (numpy.ndarray): The grid used for spatial partitioning of creatures.
+        - hashing_grid (Spatial_Hash): The grid used for spatial partitioning of creatures.
         - dt (float): The time step for the update.
-        - group (pygame.sprite.Group): The sprite group that the creature belongs to.
 
         Returns:
         - None
         """
-        self.update_state(hashing_grid)
-        self.act(grid, dt, hashing_grid, group)
-        
-        # remove self from hashing grid
-        column = int(self.pos[0]/25)
-        row = int(self.pos[1]/25)
-        hashing_grid[row, column].remove(self)
         
         # updates the angle by the turn speed
-        #self.angle += np.mean(self.genes['turn-speed']) * dt
+        #self.angle += self.phenotype.turn_speed * dt
 
         # updates its orientation vector with new angle
         self.normal = np.array([np.cos(self.angle), np.sin(self.angle)])
 
         # updates its position with its speed and new normal vector
-        self.pos = self.pos + self.normal * np.mean(self.genes['speed']) * dt
+        self.pos = self.pos + self.normal * self.phenotype.speed * dt
 
         # bounces creature off walls instead of letting them go out of bounds
         if self.pos[1] <= 10 or self.pos[1] >= 590:
             self.angle = -self.angle
             # next bit of code redefines the random point it wanders toward
             # everytime it bounces
-            self.random_x = np.random.randint(10, 1290)
-            self.random_y = np.random.randint(10, 590)
+            self.random_x = rng.movement.integers(10, 1290)
+            self.random_y = rng.movement.integers(10, 590)
             
         if self.pos[0] <= 10 or self.pos[0] >= 1290:
             self.angle = np.pi - self.angle
             # same thing as above
-            self.random_x = np.random.randint(10, 1290)
-            self.random_y = np.random.randint(10, 590)
-
-        # rotates the image according to new angle
-        self.image = self.rotate(self.picture, -self.angle)
-        
-        # updates the draw position based on new position vector
-        self.rect.center = [int(self.pos[0]), int(self.pos[1])]
-
-        # add self to hashing grid in new position
-        column = int(self.pos[0]/25)
-        row = int(self.pos[1]/25)
-        hashing_grid[row, column].append(self)
-
-        # aging and death handling
+            self.random_x = rng.movement.integers(10, 1290)
+            self.random_y = rng.movement.integers(10, 590)
+
+        if not self.headless and self.shown:
+            # rotates the image according to new angle, using the cached
+            # rotations. The rect is remade since rotated pictures are
+            # different sizes
+            bucket = angle_bucket(-self.angle)
+            if bucket != self.angle_bucket:
+                self.angle_bucket = bucket
+                self.image = rotated_image(self.picture_file, self.picture_size, self.color, bucket)
+                self.rect = self.image.get_rect()
+
+            # updates the draw position based on new position vector
+            self.rect.center = [int(self.pos[0]), int(self.pos[1])]
+
+        # moves self to its new cell in the hashing grid
+        hashing_grid.move(self)
+
+        # aging, dead creatures are removed by die
         self.age += 0.1
         if self.age >= self.max_age:
             self.dead = True
 
-        if self.dead:
-            self.kill() # removes creature from all pygame sprite groups
-            hashing_grid[row, column].remove(self) # removes creature from hashing grid
-            
+    def die(self, hashing_grid):
+        """
+        Records the creature in the death log and removes it from the
+        sprite groups and the hashing grid. Called by Simulation.step after
+        every creature advanced, for the ones that died this frame.
+
+        Args:
+        - hashing_grid (Spatial_Hash): The grid used for spatial partitioning of creatures.
+
+        Returns:
+        - None
+        """
+        if self.death_log is not None:
+            self.death_log.record(self)
+
+        self.kill() # removes creature from all pygame sprite groups
+        hashing_grid.remove(self) # removes creature from hashing grid
+
     def debug(self, screen, debug_list):
         """
         The code below draws the creature's FOV and displays energy and mating statistics.
@@ -536,8 +436,8 @@ class Carnivore(pygame.sprite.Sprite):
         - None
         """
         # collecting FOV and view distance from genes
-        view_angle = np.mean(self.genes['fov'])/2
-        view_dist = np.mean(self.genes['view-dist'])
+        view_angle = self.phenotype.fov/2
+        view_dist = self.phenotype.view_dist
 
         # defining left and right angles to draw lines along relative
         # to creature's orientation
@@ -559,7 +459,7 @@ class Carnivore(pygame.sprite.Sprite):
         segments = 10
         for i in range(segments + 1):
             point = self.pos + view_dist*np.array([np.cos(self.angle + view_angle), np.sin(self.angle + view_angle)])
-            view_angle -= np.mean(self.genes['fov'])/segments
+            view_angle -= self.phenotype.fov/segments
             arc_list.append(point)
         pygame.draw.lines(screen, (255,255,255), False, arc_list) # draws list of points
 
@@ -568,10 +468,10 @@ class Carnivore(pygame.sprite.Sprite):
         statistics
         """
         energy = self.energy
-        max_energy = np.mean(self.genes['max-energy'])
+        max_energy = self.phenotype.max_energy
 
         desire_mate = self.desire_to_mate
-        max_desire = np.mean(self.genes['max-desire-to-mate'])
+        max_desire = self.phenotype.max_desire_to_mate
         
         bar_length = 100
         energy_bar_ratio = max_energy/bar_length
@@ -0,0 +1,256 @@
+import json
+import numpy as np
+import os
+import queue
+import rng
+import threading
+
+from carnivore import Carnivore
+from genetics import array_to_genes
+from herbivore import Herbivore
+from simulation import Simulation
+
+# Saves a running Simulation to a single .npz file and starts new
+# Simulations from it, so many experiments can branch from one warmed up
+# state instead of each simulating the burn in again. A checkpoint holds
+# the grass grid, every field of every creature including its genome, the
+# frame counters, the state of the random number streams (see rng.py) and
+# the statistics recorded so far. Everything else, like the hashing grid
+# and the pictures, is worked out again from those when it's loaded.
+#
+# The file has one array per creature field per species, named like
+# prey/energy, plus a json string of everything that isn't an array.
+# format_version goes up whenever the layout changes so old files aren't
+# loaded wrong.
+
+format_version = 2
+
+# Fields saved for every creature, besides its genome and position. The
+# classes name some of their counters differently
+shared_fields = (
+    'uid', 'angle', 'energy', 'can_mate', 'can_mate_counter', 'dead', 'age', 'max_age',
+    'state', 'random_x', 'random_y'
+    )
+creature_fields = {
+    'prey': shared_fields + ('desire_mate', 'doing', 'counter', 'counter_max'),
+    'predator': shared_fields + ('desire_to_mate', 'hungry', 'wander_counter', 'wander_counter_max'),
+    }
+creature_classes = {'prey': Herbivore, 'predator': Carnivore}
+
+def snapshot(simulation):
+    """
+    Copies everything a checkpoint needs out of a simulation. Quick, so
+    it's done on the main thread between frames, and the copy can be
+    written to disk while the simulation keeps going.
+
+    Args:
+    - simulation (Simulation): The simulation.
+
+    Returns:
+    - dict: Arrays keyed by their name in the file. The statistics file is
+      read later, only its length is saved here.
+    """
+    creatures = simulation.creature_group.in_order()
+    stats = simulation.creature_group.stats
+    # statistics rows are written to the file now so the checkpoint can
+    # read them from it
+    simulation.time_series.flush()
+
+    arrays = {'grid': simulation.env_grid.copy()}
+    for ptype, fields in creature_fields.items():
+        group = [creature for creature in creatures if creature.ptype == ptype]
+        arrays[ptype + '/genome'] = np.array([creature.genome for creature in group]).reshape(-1, 12, 2)
+        arrays[ptype + '/pos'] = np.array([creature.pos for creature in group]).reshape(-1, 2)
+        arrays[ptype + '/normal'] = np.array([creature.normal for creature in group]).reshape(-1, 2)
+        for name in fields:
+            arrays[ptype + '/' + name] = np.array([getattr(creature, name) for creature in group])
+        arrays[ptype + '/stats-sums'] = stats.sums[ptype].copy()
+
+    info = {
+        'format-version': format_version,
+        'width': simulation.width,
+        'height': simulation.height,
+        'cell-size': simulation.cell_size,
+        'cone-sensing': Herbivore.cone_sensing,
+        'settings': simulation.settings,
+        'gene-ranges': simulation.gene_ranges,
+        't': simulation.t,
+        'herb-count': simulation.herb_count,
+        'carn-count': simulation.carn_count,
+        'births': simulation.births,
+        'next-uid': simulation.creature_group.next_uid,
+        'random-state': rng.get_state(),
+        'statistics-location': simulation.time_series.location,
+        'statistics-rows': len(simulation.time_series),
+        'statistics-size': os.path.getsize(simulation.time_series.location),
+        }
+    arrays['info'] = np.array(json.dumps(info))
+    return arrays
+
+def write(arrays, location):
+    """
+    Writes a snapshot to disk, adding the statistics recorded up to when
+    it was taken. Written to a temporary name first so a checkpoint that's
+    interrupted while saving never replaces a good one.
+
+    Args:
+    - arrays (dict): Snapshot from snapshot.
+    - location (str): Where the .npz file is saved.
+
+    Returns:
+    - None
+    """
+    info = json.loads(str(arrays['info']))
+    with open(info['statistics-location'], 'rb') as file:
+        statistics = file.read(info['statistics-size'])
+    arrays = dict(arrays, statistics=np.frombuffer(statistics, dtype=np.uint8))
+
+    temporary = location + '.tmp.npz'
+    np.savez(temporary, **arrays)
+    os.replace(temporary, location)
+
+def save(simulation, location):
+    """
+    Saves a checkpoint of a simulation and waits for it to be written.
+
+    Args:
+    - simulation (Simulation): The simulation.
+    - location (str): Where the .npz file is saved.
+
+    Returns:
+    - None
+    """
+    write(snapshot(simulation), location)
+
+class Checkpoint_Writer:
+    """
+    Saves checkpoints from a background thread, like the Death_Log writes
+    death records. Only the snapshot is taken on the main thread, so the
+    simulation barely pauses. close has to be called at the end of the run
+    to finish the checkpoints that are still being written
+    """
+    def __init__(self):
+        """
+        Starts the writer thread.
+        """
+        self.snapshots = queue.Queue()
+        self.thread = threading.Thread(target=self.write_snapshots, daemon=True)
+        self.thread.start()
+
+    def save(self, simulation, location):
+        """
+        Takes a snapshot of a simulation and hands it to the writer thread.
+
+        Args:
+        - simulation (Simulation): The simulation.
+        - location (str): Where the .npz file is saved.
+
+        Returns:
+        - None
+        """
+        self.snapshots.put((snapshot(simulation), location))
+
+    def write_snapshots(self):
+        """
+        Runs on the writer thread. Writes snapshots until close is called.
+
+        Args:
+        - None
+
+        Returns:
+        - None
+        """
+        while True:
+            item = self.snapshots.get()
+            if item is None:
+                break
+            write(*item)
+
+    def close(self):
+        """
+        Writes the remaining snapshots and waits for the writer thread to
+        finish.
+
+        Args:
+        - None
+
+        Returns:
+        - None
+        """
+        if not self.thread.is_alive():
+            return
+        self.snapshots.put(None)
+        self.thread.join()
+
+def load(location, headless=False, stats_location='tests/testopen/data.csv',
+         death_location='death-records.csv', seed=None):
+    """
+    Starts a simulation from a checkpoint. It carries on exactly like the
+    saved one would have unless seed is given.
+
+    Args:
+    - location (str): The .npz file.
+    - headless (bool): If True nothing is ever drawn, see Simulation.
+    - stats_location (str): Where the statistics csv file is saved. Starts
+      with the rows that were recorded before the checkpoint.
+    - death_location (str): Where the creatures that die from now on are
+      saved.
+    - seed (int): If given the random number streams are seeded with it
+      instead of picking up where they were, so branches from the same
+      checkpoint turn out differently.
+
+    Returns:
+    - Simulation: The simulation.
+    """
+    with np.load(location) as data:
+        info = json.loads(str(data['info']))
+        if info['format-version'] != format_version:
+            raise ValueError('Checkpoint {} has format version {}, expected {}'.format(
+                location, info['format-version'], format_version))
+
+        simulation = Simulation(
+            info['width'], info['height'], info['cell-size'], headless=headless,
+            location=stats_location, death_location=death_location,
+            cone_sensing=info['cone-sensing'], settings=info['settings'],
+            gene_ranges={ptype: {gene: tuple(value) for gene, value in ranges.items()}
+                         for ptype, ranges in info['gene-ranges'].items()},
+            populate=False
+            )
+        simulation.env_grid[:] = data['grid']
+        simulation.time_series.restore(data['statistics'].tobytes(), info['statistics-rows'])
+
+        creatures = []
+        for ptype, fields in creature_fields.items():
+            genomes = data[ptype + '/genome']
+            pos = data[ptype + '/pos']
+            normal = data[ptype + '/normal']
+            values = {name: data[ptype + '/' + name].tolist() for name in fields}
+            for i in range(len(genomes)):
+                creature = creature_classes[ptype](
+                    array_to_genes(genomes[i]), pos[i, 0], pos[i, 1], values['angle'][i],
+                    simulation.hashing_grid
+                    )
+                creature.normal = normal[i].copy()
+                for name in fields:
+                    setattr(creature, name, values[name][i])
+                creatures.append(creature)
+
+        # added in uid order, so they keep their uids and the group counts
+        # them, then the gene sums are put back exactly as they were
+        creatures.sort(key=lambda creature: creature.uid)
+        simulation.creature_group.add(*creatures)
+        simulation.creature_group.next_uid = info['next-uid']
+        for ptype in creature_fields:
+            simulation.creature_group.stats.sums[ptype][:] = data[ptype + '/stats-sums']
+
+    simulation.t = info['t']
+    simulation.herb_count = info['herb-count']
+    simulation.carn_count = info['carn-count']
+    simulation.births = info['births']
+
+    # creating the creatures drew random numbers, so the streams are set last
+    if seed is None:
+        rng.set_state(info['random-state'])
+    else:
+        rng.seed(seed)
+    return simulation
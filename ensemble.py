@@ -0,0 +1,329 @@
+import argparse
+import numpy as np
+import os
+import rng
+import sys
+import tempfile
+
+from environment import advance_grid, max_grass
+from genetics import gene_names, gene_index
+from population import Population
+from simulation import Simulation, color_genes, default_settings, initial_gene_ranges
+
+# Runs many small copies of the model side by side to estimate things like
+# how likely a species is to die out, without paying the cost of a whole
+# Simulation per copy. Every world has its own grass grid, stacked into one
+# (worlds, rows, columns) array, and the creatures of every world share one
+# Population per species with a world field saying which world each lives
+# in. Grass growth, sensing, hunting, mating and movement are then done for
+# every world at once, and creatures only ever see, eat and mate with the
+# ones in their own world.
+#
+# A world is retired as soon as either species dies out in it, the same
+# stopping condition as a Simulation run, and its creatures are removed so
+# it costs nothing after that.
+
+def population_settings(settings):
+    """
+    Converts settings like simulation.default_settings to the settings of
+    each species' Population.
+
+    Args:
+    - settings (dict): The settings.
+
+    Returns:
+    - dict: Population settings to change, keyed by species.
+    """
+    return {
+        'prey': {
+            'maturity': settings['prey-maturity'],
+            'hunger-threshold': settings['prey-hunger-threshold'],
+            'grass-energy-divisor': settings['grass-energy-divisor'],
+            },
+        'predator': {
+            'maturity': settings['predator-maturity'],
+            'hunger-threshold': settings['hunt-threshold'],
+            },
+        }
+
+def random_creatures(gene_ranges, count, max_start_age, width, height, random):
+    """
+    Picks starting creatures of one species the same way as
+    Simulation.populate, as arrays for Population.add.
+
+    Args:
+    - gene_ranges (dict): (low, high) range of every gene of the species.
+    - count (int): Number of creatures.
+    - max_start_age (int): Starting ages are picked below this.
+    - width (int): Width of the board in pixels.
+    - height (int): Height of the board in pixels.
+    - random (numpy.random.Generator): Random numbers to pick with.
+
+    Returns:
+    - tuple: (genomes, pos, angle, age) arrays.
+    """
+    genomes = np.zeros((count, len(gene_names), 2))
+    for name, (low, high) in gene_ranges.items():
+        if name in color_genes:
+            genomes[:, gene_index[name]] = random.integers(low, high, size=(count, 2))
+        else:
+            genomes[:, gene_index[name]] = random.uniform(low, high, size=(count, 2))
+    genomes[:, gene_index['sex'], 0] = np.arange(count) % 2 # every other one is male
+
+    pos = np.column_stack([
+        random.integers(10, width - 10, size=count),
+        random.integers(10, height - 10, size=count)
+        ]).astype(float)
+    angle = -random.uniform(0, 2*np.pi, size=count)
+    age = random.integers(0, max_start_age, size=count)
+    return genomes, pos, angle, age
+
+class Ensemble:
+    """
+    A batch of independent worlds stepped together. World i starts from a
+    population picked with seeds[i], and everything after that is picked
+    from its own streams seeded by seeds[i], so a world runs the same no
+    matter which other worlds are in the batch
+    """
+    def __init__(self, seeds, width=400, height=300, cell_size=25, settings=None, gene_ranges=None):
+        """
+        Creates the worlds and their starting populations.
+
+        Args:
+        - seeds (list): Seed of each world, one world per seed.
+        - width (int): Width of every world in pixels.
+        - height (int): Height of every world in pixels.
+        - cell_size (int): Size of each environment cell.
+        - settings (dict): Values to change from simulation.default_settings.
+          num-prey and num-predators are per world.
+        - gene_ranges (dict): Ranges to change from initial_gene_ranges,
+          keyed by species and then gene.
+        """
+        self.seeds = [int(seed) for seed in seeds]
+        self.num_worlds = len(self.seeds)
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.settings = dict(default_settings, **(settings or {}))
+        self.gene_ranges = {
+            ptype: dict(ranges, **(gene_ranges or {}).get(ptype, {}))
+            for ptype, ranges in initial_gene_ranges.items()
+            }
+
+        num_rows = int(height/cell_size)
+        num_columns = int(width/cell_size)
+        self.grid = np.full((self.num_worlds, num_rows, num_columns), max_grass, dtype=float)
+
+        self.populations = {
+            ptype: Population(ptype, width=width, height=height) for ptype in ('prey', 'predator')
+            }
+        for ptype, values in population_settings(self.settings).items():
+            self.populations[ptype].settings.update(values)
+
+        # set first since adding creatures draws their max ages and wander
+        # points from the streams
+        streams = rng.World_Streams(self.seeds)
+        for population in self.populations.values():
+            population.streams = streams
+        for world, seed in enumerate(self.seeds):
+            self.populate(world, np.random.default_rng(seed))
+
+        self.frame = 0
+        self.active = np.ones(self.num_worlds, dtype=bool)
+        self.extinction_frame = np.full(self.num_worlds, -1)
+        self.final_counts = np.zeros((self.num_worlds, 2), dtype=np.int64)
+        self.history = [] # (worlds, 2) array of prey and predator counts every frame
+        self.births = np.zeros((self.num_worlds, 2), dtype=np.int64) # prey and predators born in every world
+
+    def populate(self, world, random):
+        """
+        Adds the starting creatures of one world, picked the same way as
+        Simulation.populate.
+
+        Args:
+        - world (int): The world.
+        - random (numpy.random.Generator): Random numbers for this world.
+
+        Returns:
+        - None
+        """
+        for ptype, count, max_start_age in (
+                ('prey', self.settings['num-prey'], 200),
+                ('predator', self.settings['num-predators'], 400)):
+            genomes, pos, angle, age = random_creatures(
+                self.gene_ranges[ptype], count, max_start_age, self.width, self.height, random
+                )
+            self.populations[ptype].add(genomes, pos, angle, age, world)
+
+    def counts(self):
+        """
+        Number of prey and predators in every world.
+
+        Args:
+        - None
+
+        Returns:
+        - numpy.ndarray: (worlds, 2) array of prey and predator counts.
+        """
+        return np.column_stack([
+            np.bincount(population.world[:population.count], minlength=self.num_worlds)
+            for population in self.populations.values()
+            ])
+
+    def step(self, dt):
+        """
+        Steps every active world by one frame. Creatures find their targets
+        first, then predators eat and mates pair up, then every creature is
+        ticked (see Population.tick). Worlds where a species died out are
+        retired at the end.
+
+        Args:
+        - dt (float): The time step for the update.
+
+        Returns:
+        - None
+        """
+        prey = self.populations['prey']
+        predators = self.populations['predator']
+
+        active = np.flatnonzero(self.active)
+        self.grid[active] = advance_grid(self.grid[active], dt)
+
+        prey_targets, prey_index = prey.find_targets(cell_size=self.cell_size)
+        predator_targets, predator_index = predators.find_targets(prey, self.cell_size)
+        predators.hunt(prey, predator_index)
+        for column, population, target_index in ((0, prey, prey_index), (1, predators, predator_index)):
+            children = population.mate(target_index)
+            self.births[:, column] += np.bincount(population.world[children], minlength=self.num_worlds)
+
+        prey.tick(dt, self.grid, prey_targets, self.cell_size)
+        predators.tick(dt, None, predator_targets, self.cell_size)
+        self.frame += 1
+
+        counts = self.counts()
+        self.history.append(counts)
+        self.retire(np.flatnonzero(self.active & ((counts[:, 0] == 0) | (counts[:, 1] == 0))), counts)
+
+    def retire(self, worlds, counts):
+        """
+        Stops stepping some worlds and removes their creatures.
+
+        Args:
+        - worlds (numpy.ndarray): The worlds to retire.
+        - counts (numpy.ndarray): Current counts of every world, from counts.
+
+        Returns:
+        - None
+        """
+        if len(worlds) == 0:
+            return
+        self.active[worlds] = False
+        self.extinction_frame[worlds] = self.frame
+        self.final_counts[worlds] = counts[worlds]
+        for population in self.populations.values():
+            population.take(np.isin(population.world[:population.count], worlds))
+
+    def run(self, dt, max_ticks=None):
+        """
+        Steps until every world is retired or max_ticks frames have run.
+
+        Args:
+        - dt (float): Time step for every frame.
+        - max_ticks (int): Maximum number of frames. None runs until every
+          world is retired.
+
+        Returns:
+        - int: Number of frames that were run.
+        """
+        while self.active.any() and (max_ticks is None or self.frame < max_ticks):
+            self.step(dt)
+        # worlds still going keep their counts from the last frame
+        self.final_counts[self.active] = self.counts()[self.active]
+        return self.frame
+
+    def results(self):
+        """
+        One row per world, like the rows sweep.py saves for a single run.
+
+        Args:
+        - None
+
+        Returns:
+        - list: Dict of the seed, whether it went extinct, when, and the
+          final counts of every world.
+        """
+        return [
+            {
+                'seed': seed,
+                'extinct': not self.active[world],
+                'extinction-frame': int(self.extinction_frame[world]) if not self.active[world] else '',
+                'final-num-prey': int(self.final_counts[world, 0]),
+                'final-num-predators': int(self.final_counts[world, 1]),
+                }
+            for world, seed in enumerate(self.seeds)
+            ]
+
+    def extinction_probability(self):
+        """
+        Fraction of the worlds where a species died out.
+
+        Args:
+        - None
+
+        Returns:
+        - float: The fraction.
+        """
+        return float(np.mean(~self.active))
+
+def compare_births(seeds, ticks, dt=0.025):
+    """
+    Runs every seed in a Simulation and in one Ensemble and counts the
+    children born in each, to check the array version of the model
+    breeds like the one it's copied from. Both use Simulation's board
+    size, since it places its starting creatures for that size. The runs
+    aren't the same creature for creature, so only the totals should be
+    close.
+
+    Args:
+    - seeds (list): Seed of each run.
+    - ticks (int): Most frames each run can go for.
+    - dt (float): Time step for every frame.
+
+    Returns:
+    - tuple: (simulation, ensemble) arrays of shape (seeds, 2) with the
+      number of prey and predators born in every run.
+    """
+    simulation_births = np.zeros((len(seeds), 2), dtype=np.int64)
+    with tempfile.TemporaryDirectory() as folder:
+        for i, seed in enumerate(seeds):
+            simulation = Simulation(
+                headless=True, location=os.path.join(folder, 'data.csv'),
+                death_location=os.path.join(folder, 'deaths.csv'), seed=seed
+                )
+            simulation.run(dt, ticks)
+            simulation.close()
+            simulation_births[i] = simulation.births['prey'], simulation.births['predator']
+
+    ensemble = Ensemble(seeds, width=simulation.width, height=simulation.height)
+    ensemble.run(dt, ticks)
+    return simulation_births, ensemble.births
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Checks an Ensemble breeds like Simulation')
+    parser.add_argument('--seeds', type=int, default=4,
+                        help='number of seeds run in both')
+    parser.add_argument('--ticks', type=int, default=1500,
+                        help='most frames each run can go for')
+    parser.add_argument('--tolerance', type=float, default=0.35,
+                        help='largest difference allowed between the average number of predators born, as a fraction of Simulation\'s')
+    args = parser.parse_args()
+
+    simulation_births, ensemble_births = compare_births(list(range(1, args.seeds + 1)), args.ticks)
+    for name, births in (('Simulation', simulation_births), ('Ensemble', ensemble_births)):
+        print('{}: prey born {}, predators born {}'.format(name, births[:, 0].tolist(), births[:, 1].tolist()))
+
+    expected = simulation_births[:, 1].mean()
+    difference = abs(ensemble_births[:, 1].mean() - expected)/max(expected, 1)
+    if difference > args.tolerance:
+        sys.exit('Predator births differ by {:.0%}, more than {:.0%}'.format(difference, args.tolerance))
+    print('Predator births differ by {:.0%}'.format(difference))
@@ -1,6 +1,8 @@
 import numpy as np
 import pygame
 
+from spatial import Spatial_Hash
+
 max_grass = 50.0
 grow_rate = 3
 
@@ -55,7 +57,32 @@ def grass_color_gradient(x):
     else:
         return (205, 133, 63)
 
-def create_environment(num_cells_x, num_cells_y, cell_size):
+# Lookup table of the 10 colors in grass_color_gradient, one row per
+# band. Index i holds the color for grass ratios in [i/10, (i+1)/10)
+grass_colors = np.array(
+    [grass_color_gradient((i + 0.5) / 10) for i in range(10)], dtype=np.uint8
+    )
+
+# Lower edges of bands 1-9 of grass_color_gradient
+grass_color_bands = np.array([0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9])
+
+def grass_color_index(x):
+    """
+    Array version of grass_color_gradient. Returns which of the 10 colors
+    every value of x falls into, using the same band edges. Values below 0
+    or above 1 get the dirt color just like in grass_color_gradient
+
+    Args:
+    - x (numpy.ndarray): Values of grass divided by the maximum grass.
+
+    Returns:
+    - numpy.ndarray: Index into grass_colors for every value of x.
+    """
+    index = np.digitize(x, grass_color_bands)
+    index[(x < 0) | (x > 1)] = 0
+    return index
+
+def create_environment(num_cells_x, num_cells_y, cell_size, headless=False):
     """
     Initializes the environment and creates the cells
 
@@ -63,28 +90,25 @@ def create_environment(num_cells_x, num_cells_y, cell_size):
     - num_cells_x (int): Number of cells in the x-axis.
     - num_cells_y (int): Number of cells in the y-axis.
     - cell_size (int): Size of each cell.
+    - headless (bool): If True the grid is never drawn and no renderer is made.
 
     Returns:
     - env_grid (np.array(int)): Numpy array representing environment
-    - hashing_grid (np.array(int)): Numpy array that is used for storing creatures at every time-step
-    - env_cell_group (pygame.sprite.group):  Sprite group containing each environment cell
+    - env_renderer (Env_Renderer): Draws the whole grass grid to the screen, None if headless
+    - hashing_grid (Spatial_Hash): Stores which cell every creature is in, see spatial.py
     """
     env_grid = np.full((num_cells_y, num_cells_x), max_grass)
 
-    hashing_grid = np.zeros((num_cells_y, num_cells_x), dtype=object)
-
-    # Sprite group contains pygame sprite objects. Used for drawing groups of sprites
-    # in one line vs having to use for loops in main simulation loop below
-    env_cell_group = pygame.sprite.Group()
+    hashing_grid = Spatial_Hash(num_cells_x, num_cells_y, cell_size)
 
-    # Generating environment cells
-    for x in range(num_cells_x):
-        for y in range(num_cells_y):
-            hashing_grid[y, x] = []
-            cell = Env_Cell(x * cell_size, y * cell_size, x, y, cell_size)
-            env_cell_group.add(cell)
+    # One surface for the whole grid instead of a sprite per cell, so
+    # drawing the grass doesn't get slower as the number of cells goes up
+    env_renderer = None
+    if not headless:
+        env_renderer = Env_Renderer(num_cells_x, num_cells_y, cell_size)
+        env_renderer.update(env_grid)
 
-    return env_grid, env_cell_group, hashing_grid
+    return env_grid, env_renderer, hashing_grid
 
 def on_board(x, y, grid):
     """
@@ -126,77 +150,84 @@ def get_neighbor_values(x, y, board):
 
     return neighbor_values
 
-def advance_grid(grid, dt):
+def advance_grid(grid, dt, out=None):
     """
     Code from CSME 201. Used to update the environment grid. The updated
     grid is used by the environment pygame sprite group to update their
     color on the screen
 
+    The growth rules are applied to the whole array at once instead of
+    looping over every cell. Neighbor checks are done with shifted slices
+    of the grid, so the edges of the board only see the neighbors that are
+    actually on the board, same as get_neighbor_values
+
     Args:
-    - grid (numpy.ndarray): Grid representing the environment.
+    - grid (numpy.ndarray): Grid representing the environment. Can have
+      extra leading dimensions for a batch of grids, see ensemble.py.
     - dt (float): Time step for updating the grid.
+    - out (numpy.ndarray): Optional array to write the new grid into. Can be
+      grid itself to update it in place.
 
     Returns:
     - new_grid (numpy.ndarray): Updated grid with grass growth.
     """
-    new_grid = np.zeros_like(grid)
-
-    for x in range(grid.shape[0]):
-        for y in range(grid.shape[1]):
-            """
-            If cell has no grass and no neighbors with grass, it doesn't grow
-            If cell has no grass and neighbors with grass, it will start to grow
-            If cell has grass, it will grow until it reaches max_grass
-            """
-            if grid[x, y] == 0:
-                if max_grass in get_neighbor_values(x, y, grid):
-                    new_grid[x, y] = grow_rate * dt
-
-            elif grid[x, y] > 0 and grid[x, y] < max_grass:
-                next_value = grid[x, y] + grow_rate * dt
-                if next_value > max_grass:
-                    new_grid[x, y] = max_grass
-                else:
-                    new_grid[x, y] += grid[x, y] + grow_rate * dt
+    if out is None:
+        out = np.empty_like(grid)
 
-            elif grid[x, y] >= max_grass:
-                new_grid[x, y] = max_grass
-
-    return new_grid
-
-class Env_Cell(pygame.sprite.Sprite):
     """
-    Cells for the environment grass grid. Inherits from pygame sprite class
-    for drawing to the screen
+    If cell has no grass and no neighbors with grass, it doesn't grow
+    If cell has no grass and neighbors with grass, it will start to grow
+    If cell has grass, it will grow until it reaches max_grass
+    """
+    # cells with no grass that have a neighbor at max_grass (up, down,
+    # left or right) start growing. Has to be found before out is written
+    # to since out can be the same array as grid
+    full = grid == max_grass
+    seeded = np.zeros(grid.shape, dtype=bool)
+    seeded[..., 1:, :] |= full[..., :-1, :]
+    seeded[..., :-1, :] |= full[..., 1:, :]
+    seeded[..., :, 1:] |= full[..., :, :-1]
+    seeded[..., :, :-1] |= full[..., :, 1:]
+    seeded &= grid == 0
+    empty = grid <= 0
+
+    # every other cell grows and is clamped to max_grass
+    np.add(grid, grow_rate * dt, out=out)
+    np.minimum(out, max_grass, out=out)
+    out[empty] = 0
+    out[seeded] = grow_rate * dt
+
+    return out
+
+class Env_Renderer:
+    """
+    Draws the environment grass grid to the screen. The grid is mapped
+    through the grass_colors lookup table into a small surface with one
+    pixel per cell, which is then scaled up to the screen size once per
+    frame. Has the same update and draw methods the old sprite group of
+    cells had
     """
-    def __init__(self, x, y, id_x, id_y, size):
+    def __init__(self, num_cells_x, num_cells_y, cell_size):
         """
-        Initializes an instance of Env_Cell.
-        
+        Initializes an instance of Env_Renderer.
+
         Args:
-        - x (int): x-coordinate of the cell's top-left corner.
-        - y (int): y-coordinate of the cell's top-left corner.
-        - id_x (int): x-index of the cell in the grid.
-        - id_y (int): y-index of the cell in the grid.
-        - size (int): Size of the cell (width and height).
+        - num_cells_x (int): Number of cells in the x-axis.
+        - num_cells_y (int): Number of cells in the y-axis.
+        - cell_size (int): Size of each cell (width and height).
         """
-        super().__init__()
-        self.pos_x = x
-        self.pos_y = y
-        self.id_x = id_x
-        self.id_y = id_y
-        self.size = size
-        self.grass = 50 # Initialize to maximum grass height
-
-        # Pygame stuff for drawing cell to screen
-        self.image = pygame.Surface([self.size, self.size])
-        self.image.fill(grass_color_gradient(self.grass / 50))
+        self.cell_size = cell_size
+
+        # one pixel per grid cell
+        self.cells = pygame.Surface((num_cells_x, num_cells_y))
+
+        # the cells surface scaled up to the size of the board
+        self.image = pygame.Surface((num_cells_x * cell_size, num_cells_y * cell_size))
         self.rect = self.image.get_rect()
-        self.rect.topleft = [self.pos_x, self.pos_y]
 
     def update(self, grid):
         """
-        Updates the cell's attributes based on the current state of the environment grid.
+        Recolors the board based on the current state of the environment grid.
 
         Args:
         - grid (numpy array): Grid representing the environment.
@@ -204,13 +235,19 @@ class Env_Cell(pygame.sprite.Sprite):
         Returns:
         - None
         """
-        # gets the grass amount from the environment grid
-        self.grass = grid[self.id_y, self.id_x]
+        # grid is indexed [row, column] but surfarray is indexed [x, y]
+        colors = grass_colors[grass_color_index(grid / max_grass)]
+        pygame.surfarray.blit_array(self.cells, colors.transpose(1, 0, 2))
+        pygame.transform.scale(self.cells, self.image.get_size(), self.image)
 
-        # updates its color in accordance with the grass_color_gradient function
-        self.image.fill(grass_color_gradient(self.grass / 50))
+    def draw(self, screen):
+        """
+        Draws the board to the screen.
+
+        Args:
+        - screen (pygame.display): The screen to draw on.
 
-        # NOTE: 50 is the maximum grass amount per cell as decided in the
-        # advance_grid function. It's probably best to find a way to pass
-        # this variable to the update function to avoid future issues,
-        # should we decide we want the maximum grass amount to vary
+        Returns:
+        - None
+        """
+        screen.blit(self.image, self.rect)
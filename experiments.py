@@ -0,0 +1,244 @@
+import csv
+import glob
+import hashlib
+import json
+import numpy as np
+import os
+import sqlite3
+import time
+
+# Local store of finished runs, so a sweep never runs the same thing twice
+# and results can be looked up later without simulating again. Every run
+# is keyed by a hash of its full configuration, its seed and the version of
+# the code, so changing any setting or any line of the model gives a new
+# key. The summary of every run is kept in an SQLite database and its
+# statistics time series in a numpy .npz file with one array per column
+
+def code_version(folder=None):
+    """
+    Hash of the model's source code, every .py file in folder. Changes
+    whenever any of the code changes, whether it's committed or not.
+
+    Args:
+    - folder (str): Folder of the code. Defaults to the folder of this file.
+
+    Returns:
+    - str: The hash.
+    """
+    if folder is None:
+        folder = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha1()
+    for path in sorted(glob.glob(os.path.join(folder, '*.py'))):
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+def run_key(config, seed, version):
+    """
+    Key of a run.
+
+    Args:
+    - config (dict): Full configuration of the run. Has to be json.
+    - seed (int): Random seed of the run.
+    - version (str): Version of the code, from code_version.
+
+    Returns:
+    - str: Hash of all three.
+    """
+    text = json.dumps({'config': config, 'seed': seed, 'version': version}, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def save_time_series(csv_location, npz_location):
+    """
+    Converts a statistics csv file written by Time_Series_Writer to an
+    .npz file with one array per column, and deletes the csv file.
+
+    Args:
+    - csv_location (str): The csv file.
+    - npz_location (str): Where the .npz file is saved.
+
+    Returns:
+    - None
+    """
+    with open(csv_location, newline='') as file:
+        reader = csv.reader(file)
+        columns = next(reader)[1:] # first column is the row number
+        rows = [row[1:] for row in reader]
+    values = np.array(rows, dtype=float).reshape(len(rows), len(columns))
+    # written to a temporary name first so a run that's interrupted while
+    # saving never leaves half a file behind
+    temporary = npz_location + '.tmp.npz'
+    np.savez_compressed(temporary, **{column: values[:, i] for i, column in enumerate(columns)})
+    os.replace(temporary, npz_location)
+    os.remove(csv_location)
+
+class Experiment_Store:
+    """
+    SQLite table of runs plus a folder of time series files. A run is
+    marked running when it's started and done when its results are saved,
+    so runs that were interrupted are simply started again
+    """
+    def __init__(self, folder='experiments'):
+        """
+        Opens the store, creating it if it doesn't exist.
+
+        Args:
+        - folder (str): Folder the database and time series are kept in.
+        """
+        self.folder = folder
+        self.series_folder = os.path.join(folder, 'series')
+        os.makedirs(self.series_folder, exist_ok=True)
+        self.version = code_version()
+
+        self.connection = sqlite3.connect(os.path.join(folder, 'runs.sqlite'))
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS runs (
+                key TEXT PRIMARY KEY,
+                config TEXT,
+                seed INTEGER,
+                version TEXT,
+                status TEXT,
+                started REAL,
+                finished REAL,
+                summary TEXT
+            )''')
+        self.connection.commit()
+
+    def key(self, config, seed):
+        """
+        Key of a run with the current code.
+
+        Args:
+        - config (dict): Full configuration of the run.
+        - seed (int): Random seed of the run.
+
+        Returns:
+        - str: The key.
+        """
+        return run_key(config, seed, self.version)
+
+    def series_location(self, key):
+        """
+        Where the time series of a run is saved.
+
+        Args:
+        - key (str): Key of the run.
+
+        Returns:
+        - str: Path of the .npz file.
+        """
+        return os.path.join(self.series_folder, key + '.npz')
+
+    def is_done(self, key):
+        """
+        Checks if a run already finished.
+
+        Args:
+        - key (str): Key of the run.
+
+        Returns:
+        - bool: True if its results are saved.
+        """
+        row = self.connection.execute('SELECT status FROM runs WHERE key = ?', (key,)).fetchone()
+        return row is not None and row[0] == 'done'
+
+    def start(self, key, config, seed):
+        """
+        Marks a run as started.
+
+        Args:
+        - key (str): Key of the run.
+        - config (dict): Full configuration of the run.
+        - seed (int): Random seed of the run.
+
+        Returns:
+        - None
+        """
+        self.connection.execute(
+            'INSERT OR REPLACE INTO runs (key, config, seed, version, status, started) VALUES (?, ?, ?, ?, ?, ?)',
+            (key, json.dumps(config, sort_keys=True), seed, self.version, 'running', time.time())
+            )
+        self.connection.commit()
+
+    def finish(self, key, summary):
+        """
+        Saves the summary of a finished run. Its time series has to be saved
+        already.
+
+        Args:
+        - key (str): Key of the run.
+        - summary (dict): Summary of the run, like a row of the sweep results.
+
+        Returns:
+        - None
+        """
+        self.connection.execute(
+            'UPDATE runs SET status = ?, finished = ?, summary = ? WHERE key = ?',
+            ('done', time.time(), json.dumps(summary), key)
+            )
+        self.connection.commit()
+
+    def summary(self, key):
+        """
+        Summary of a finished run.
+
+        Args:
+        - key (str): Key of the run.
+
+        Returns:
+        - dict: The summary, None if the run isn't done.
+        """
+        row = self.connection.execute(
+            'SELECT summary FROM runs WHERE key = ? AND status = ?', (key, 'done')
+            ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def runs(self, **settings):
+        """
+        Finished runs of the current code, optionally only the ones with
+        some settings. Settings are matched against the 'settings' part of
+        the configuration, with _ standing for - in the names.
+
+        Args:
+        - settings: Setting values to match, for example prey_maturity=50.
+
+        Returns:
+        - list: (key, config, seed, summary) of every matching run.
+        """
+        rows = self.connection.execute(
+            'SELECT key, config, seed, summary FROM runs WHERE status = ? AND version = ?',
+            ('done', self.version)
+            )
+        matches = []
+        for key, config, seed, summary in rows:
+            config = json.loads(config)
+            run_settings = config.get('settings', {})
+            if all(run_settings.get(name.replace('_', '-')) == value for name, value in settings.items()):
+                matches.append((key, config, seed, json.loads(summary)))
+        return matches
+
+    def time_series(self, key):
+        """
+        Loads the time series of a finished run.
+
+        Args:
+        - key (str): Key of the run.
+
+        Returns:
+        - dict: Array of every column keyed by column name.
+        """
+        with np.load(self.series_location(key)) as data:
+            return {column: data[column] for column in data.files}
+
+    def close(self):
+        """
+        Closes the database.
+
+        Args:
+        - None
+
+        Returns:
+        - None
+        """
+        self.connection.close()
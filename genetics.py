@@ -0,0 +1,135 @@
+import numpy as np
+import rng
+
+# Order of the genes in a genome array. Every gene has 2 copies, so the
+# genomes of a population are stored as an array of shape (n, 12, 2)
+gene_names = [
+    'speed', 'turn-speed', 'fov', 'view-dist', 'max-energy', 'metabolism-rate',
+    'find-mate-rate', 'max-desire-to-mate', 'sex', 'red', 'green', 'blue'
+    ]
+gene_index = {name: i for i, name in enumerate(gene_names)}
+
+# Genes grouped by how they mutate, see form_gametes. Sex and colors are
+# mutated their own way
+added_genes = np.array([gene_index[name] for name in ('speed', 'turn-speed', 'fov')])
+positive_genes = np.array([gene_index[name] for name in (
+    'view-dist', 'max-energy', 'metabolism-rate', 'find-mate-rate', 'max-desire-to-mate'
+    )])
+color_indices = np.array([gene_index[name] for name in ('red', 'green', 'blue')])
+
+class Phenotype:
+    """
+    The gene values a creature expresses, averaged from both copies of each
+    gene. Genes never change after a creature is born, so this is worked
+    out once in __init__ and read everywhere else instead of calling
+    np.mean on the genes every frame. Can't be changed after it's made
+    """
+    __slots__ = (
+        'speed', 'turn_speed', 'fov', 'view_dist', 'max_energy', 'metabolism_rate',
+        'find_mate_rate', 'max_desire_to_mate', 'sex', 'color'
+        )
+
+    def __init__(self, genes):
+        """
+        Expresses a genes dictionary or genome array.
+
+        Args:
+        - genes (dict or numpy.ndarray): Dictionary with both copies of
+          every gene, or a genome array of shape (12, 2).
+        """
+        if isinstance(genes, dict):
+            genes = genes_to_array(genes)
+        # averaging value from both chromosomes. Stored as python floats
+        # since math on them is faster than on numpy scalars
+        expressed = dict(zip(gene_names, genes.mean(axis=1).tolist()))
+
+        set_value = object.__setattr__
+        set_value(self, 'speed', expressed['speed'])
+        set_value(self, 'turn_speed', expressed['turn-speed'])
+        set_value(self, 'fov', expressed['fov'])
+        set_value(self, 'view_dist', expressed['view-dist'])
+        set_value(self, 'max_energy', expressed['max-energy'])
+        set_value(self, 'metabolism_rate', expressed['metabolism-rate'])
+        set_value(self, 'find_mate_rate', expressed['find-mate-rate'])
+        set_value(self, 'max_desire_to_mate', expressed['max-desire-to-mate'])
+        set_value(self, 'sex', 1 if expressed['sex'] > 0 else 0) # 1 = male, 0 = female
+        set_value(self, 'color', (
+            round(expressed['red']),
+            round(expressed['green']),
+            round(expressed['blue']),
+            100 # alpha channel
+            ))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Phenotype values can\'t be changed')
+
+    def __delattr__(self, name):
+        raise AttributeError('Phenotype values can\'t be changed')
+
+def genes_to_array(genes):
+    """
+    Converts a genes dictionary like the ones used by the Herbivore and
+    Carnivore classes to a genome array.
+
+    Args:
+    - genes (dict): Dictionary with both copies of every gene.
+
+    Returns:
+    - numpy.ndarray: Array of shape (12, 2) in the order of gene_names.
+    """
+    return np.array([genes[name] for name in gene_names], dtype=float)
+
+def array_to_genes(genome):
+    """
+    Converts a genome array back to a genes dictionary.
+
+    Args:
+    - genome (numpy.ndarray): Array of shape (12, 2) in the order of gene_names.
+
+    Returns:
+    - dict: Dictionary with both copies of every gene.
+    """
+    return {name: genome[i].tolist() for i, name in enumerate(gene_names)}
+
+def form_gametes(genomes, stream=None):
+    """
+    Creatures are haploid, so have 2 copies of each gene on 2 different
+    chromosomes. This mimics "crossing over" in meiosis for many parents
+    at once and returns a half set of genes from each, which is combined
+    with the other parent's half set. Picks one copy of every gene, then
+    1 in 5 gametes has one random gene mutated: speed, turn speed and fov
+    change by up to 2, the other rates and amounts too but never go below
+    0, sex is picked again and colors change by up to 10 and wrap around
+    at 256.
+
+    Args:
+    - genomes (numpy.ndarray): Array of shape (n, 12, 2) of the parents' genomes.
+    - stream (rng.Random_Stream): Stream to draw from. Defaults to
+      rng.genetics.
+
+    Returns:
+    - numpy.ndarray: Array of shape (n, 12) of gametes, one per parent.
+    """
+    if stream is None:
+        stream = rng.genetics
+    n = len(genomes)
+    copy = stream.integers(0, 2, size=(n, len(gene_names)))
+    gametes = np.take_along_axis(genomes, copy[:, :, None], axis=2)[:, :, 0]
+
+    # picks which gametes mutate and which gene in each
+    mutated = np.flatnonzero(stream.integers(1, 5+1, size=n) > 4) # 20% chance of mutation
+    gene = stream.integers(0, len(gene_names), size=len(mutated))
+    values = gametes[mutated, gene]
+    step = stream.uniform(-2, 2, size=len(mutated))
+
+    added = np.isin(gene, added_genes)
+    values[added] += step[added]
+    positive = np.isin(gene, positive_genes)
+    values[positive] = np.maximum(0, values[positive] + step[positive])
+    sex = gene == gene_index['sex']
+    values[sex] = stream.integers(0, 2, size=sex.sum())
+    color = np.isin(gene, color_indices)
+    values[color] = (values[color] + stream.integers(-10, 10, size=color.sum())) % 256
+
+    gametes[mutated, gene] = values
+    return gametes
@@ -1,11 +1,80 @@
-import numpy as np
-import pandas as pd
+import argparse
 import pygame
 import sys
-
-from carnivore import Carnivore
-from environment import *
-from herbivore import Herbivore
+import time
+
+from assets import cache_report, set_angle_buckets
+from checkpoint import Checkpoint_Writer, load
+from parallel import Tiled_World
+from profiler import Tick_Profiler
+from records import Time_Series_Writer
+from simulation import Simulation
+
+# Command line options. With --headless no window is opened and the model
+# runs as fast as it can until --ticks frames or one species dies out
+parser = argparse.ArgumentParser(description='Runs the ecosystem model')
+parser.add_argument('--headless', action='store_true',
+                    help='run without a pygame window')
+parser.add_argument('--ticks', type=int, default=None,
+                    help='maximum number of frames to run (default: until extinction)')
+parser.add_argument('--output', default='tests/testopen/data.csv',
+                    help='where the statistics csv file is saved')
+parser.add_argument('--deaths', default='death-records.csv',
+                    help='where the age and genes of every creature that dies are saved')
+parser.add_argument('--cone-sensing', action='store_true',
+                    help='creatures only look through cells that could be in their field of view')
+parser.add_argument('--angle-buckets', type=int, default=64,
+                    help='number of angles the creature pictures are pre-rotated to')
+parser.add_argument('--cache-report', action='store_true',
+                    help='print how much memory the picture caches used when the window is closed')
+parser.add_argument('--seed', type=int, default=None,
+                    help='seed of the random numbers, the same seed always gives the same run')
+parser.add_argument('--resume', default=None,
+                    help='checkpoint file to start from instead of new creatures. With --seed the run branches off from it')
+parser.add_argument('--checkpoint', default='checkpoint.npz',
+                    help='where the k key saves a checkpoint')
+parser.add_argument('--steps-per-frame', type=int, default=1,
+                    help='simulation frames stepped for every frame drawn, changed with [ and ]')
+parser.add_argument('--target-fps', type=float, default=30,
+                    help='frame rate the auto mode (f key) picks the steps per frame for')
+parser.add_argument('--profile', default=None,
+                    help='csv file the time spent in every phase of a frame is saved to')
+parser.add_argument('--profile-every', type=int, default=100,
+                    help='number of frames averaged in each row of the profile')
+parser.add_argument('--tiled', type=int, default=None, metavar='PROCESSES',
+                    help='with --headless, run the array version of the model split into tiles stepped by this many worker processes (0 steps them in this process)')
+parser.add_argument('--board', type=int, nargs=2, default=(1300, 600), metavar=('WIDTH', 'HEIGHT'),
+                    help='size of the board in pixels for --tiled')
+parser.add_argument('--creatures', type=int, nargs=2, default=None, metavar=('PREY', 'PREDATORS'),
+                    help='number of starting creatures for --tiled (default: 80 of each)')
+args = parser.parse_args()
+
+# Used to ensure framerate independence
+# NOTE!! I think framerate independence was causing a fatal bug
+# when python starts lagging with large agent numbers so I replaced
+# it with static dt value
+dt = 0.025
+
+if args.headless and args.tiled is not None:
+    # only the statistics are saved, there's no death log or checkpoints
+    time_series = Time_Series_Writer(args.output)
+    with Tiled_World(*args.board, processes=args.tiled, seed=args.seed) as world:
+        world.populate(*(args.creatures or (None, None)))
+        world.run(dt, args.ticks, time_series)
+    time_series.close()
+    sys.exit()
+
+if args.headless:
+    if args.resume is None:
+        simulation = Simulation(headless=True, location=args.output, death_location=args.deaths,
+                                cone_sensing=args.cone_sensing, seed=args.seed)
+    else:
+        simulation = load(args.resume, True, args.output, args.deaths, args.seed)
+    if args.profile is not None:
+        simulation.profiler = Tick_Profiler(args.profile, args.profile_every)
+    simulation.run(dt, args.ticks)
+    simulation.close()
+    sys.exit()
 
 # General setup for pygame
 pygame.init()
@@ -15,103 +84,47 @@ width = 1300
 height = 600
 screen = pygame.display.set_mode((width, height))
 
-# Set up for environment
-cell_size = 25
-num_cells_x = int(width/cell_size)
-num_cells_y = int(height/cell_size)
-
-# env_grid is the numpy array that holds the grass values,
-# env_cell_group is the pygame sprite group for drawing the
-# grass cells to the screen. Hashing grid is used to store the creatures
-# positions to avoid looping through every organism each frame
-env_grid, env_cell_group, hashing_grid = create_environment(num_cells_x, num_cells_y, cell_size)
-
-creature_group = pygame.sprite.Group()
-
-for i in range(80):
-    # Randomized Genes for each animal
-    genes = {
-        'speed': [np.random.uniform(50, 150), np.random.uniform(50, 150)],
-        'turn-speed': [np.random.uniform(0, 2*np.pi), np.random.uniform(0, 2*np.pi)],
-        'fov': [np.random.uniform(0, 2*np.pi), np.random.uniform(0, 2*np.pi)],
-        'view-dist': [np.random.uniform(60, 250), np.random.uniform(60, 250)],
-        'max-energy': [np.random.uniform(75, 250), np.random.uniform(75, 250)],
-        'metabolism-rate': [np.random.uniform(0.01, 0.5), np.random.uniform(0.01, 0.5)],
-        'find-mate-rate': [np.random.uniform(0.1, 5), np.random.uniform(0.1, 5)],
-        'max-desire-to-mate': [np.random.uniform(40, 75), np.random.uniform(40, 75)],
-        'sex': [i % 2, 0], # male = [0, 1] or [1, 0], female = [0, 0]
-        'red': [np.random.randint(0, 256), np.random.randint(0, 256)],
-        'green': [np.random.randint(0, 256), np.random.randint(0, 256)],
-        'blue': [np.random.randint(0, 256), np.random.randint(0, 256)]
-        }
-    
-    creature = Herbivore(
-        genes,
-        np.random.randint(10, 1290), np.random.randint(10, 590),
-        -np.random.uniform(0, 2*np.pi),
-        hashing_grid
-        )
-    creature.age = np.random.randint(0, 200)
-    creature_group.add(creature)
-
-#This will add 50 creatures of prey and predator
-for i in range(80):
-    genes = {
-        'speed': [np.random.uniform(80, 200), np.random.uniform(80, 200)],
-        'turn-speed': [np.random.uniform(np.pi/2, 2*np.pi), np.random.uniform(np.pi/2, 2*np.pi)],
-        'fov': [np.random.uniform(0, 2*np.pi), np.random.uniform(0, 2*np.pi)],
-        'view-dist': [np.random.uniform(60, 250), np.random.uniform(60, 250)],
-        'max-energy': [np.random.uniform(75, 250), np.random.uniform(75, 250)],
-        'metabolism-rate': [np.random.uniform(0.01, 0.5), np.random.uniform(0.01, 0.5)],
-        'find-mate-rate': [np.random.uniform(5, 10), np.random.uniform(5, 10)],
-        'max-desire-to-mate': [np.random.uniform(40, 75), np.random.uniform(40, 75)],
-        'sex': [i % 2, 0], # male = [0, 1] or [1, 0], female = [0, 0]
-        'red': [np.random.randint(0, 256), np.random.randint(0, 256)],
-        'green': [np.random.randint(0, 256), np.random.randint(0, 256)],
-        'blue': [np.random.randint(0, 256), np.random.randint(0, 256)]
-        }
-    creature = Carnivore(
-        genes,
-        np.random.randint(10, 1290), np.random.randint(10, 590),
-        -np.random.uniform(0, 2*np.pi),
-        hashing_grid
-        )
-    creature.age = np.random.randint(0, 400)
-    creature_group.add(creature)
+set_angle_buckets(args.angle_buckets)
+
+if args.resume is None:
+    simulation = Simulation(width, height, location=args.output, death_location=args.deaths,
+                            cone_sensing=args.cone_sensing, seed=args.seed)
+else:
+    simulation = load(args.resume, False, args.output, args.deaths, args.seed)
+creature_group = simulation.creature_group
+
+# saves checkpoints in the background when k is pressed
+checkpoint_writer = Checkpoint_Writer()
+
+# times every phase of every frame, shown when o is pressed and saved to
+# --profile if it's given
+profiler = Tick_Profiler(args.profile, args.profile_every)
+simulation.profiler = profiler
+show_profile = False
+profile_font = pygame.font.SysFont('monospace', 14)
 
 # debug list contains selected creatures and displays their characteristics
 # to the screen, like HP, hunger, desire to mate, and FOV
 debug_list = []
 
-# Data tracking lists
-t = 0
-time_list = []
-num_herbivores = []
-num_carnivores = []
-avg_speed = []
-avg_turn_speed = []
-avg_fov = []
-avg_view_dist = []
-avg_max_energy = []
-avg_metabolism_rate = []
-avg_find_mate_rate = []
-avg_max_desire_to_mate = []
-
 # Main simulation loop. Instead of running until user clicks exit, can use conditions
 # previous_time = time.time()
 pause = False
 running = True
-plot_timer = 1
+ticks = 0
+
+# Fast forward. Several simulation frames are stepped for every frame that's
+# drawn, [ and ] halve and double how many. In auto mode (f key) the number
+# is picked from how long stepping and drawing take so the window keeps
+# close to the target frame rate
+steps_per_frame = max(1, args.steps_per_frame)
+max_steps_per_frame = 1024
+auto_steps = False
+frame_start = time.perf_counter()
 #clock = pygame.time.Clock()
 while running:
     #clock.tick()
-    # Used to ensure framerate independence
-    # NOTE!! I think framerate independence was causing a fatal bug
-    # when python starts lagging with large agent numbers so I replaced
-    # it with static dt value
-    dt = 0.025 #time.time() - previous_time
-    #previous_time = time.time()
-    
+
     for event in pygame.event.get(): # pygame event handling
         if event.type == pygame.QUIT: # if exit button is clicked
             running = False
@@ -119,7 +132,17 @@ while running:
         if event.type == pygame.KEYDOWN: # checks for p key being pressed
             if event.key == pygame.K_p:
                 pause = not pause # toggles pause
-                
+            if event.key == pygame.K_RIGHTBRACKET: # fast forward faster
+                steps_per_frame = min(2*steps_per_frame, max_steps_per_frame)
+                auto_steps = False
+            if event.key == pygame.K_LEFTBRACKET: # fast forward slower
+                steps_per_frame = max(steps_per_frame // 2, 1)
+                auto_steps = False
+            if event.key == pygame.K_f: # toggles auto fast forward
+                auto_steps = not auto_steps
+            if event.key == pygame.K_o: # toggles the profile overlay
+                show_profile = not show_profile
+
         if event.type == pygame.KEYDOWN: # clears the debug list
             if event.key == pygame.K_a:
                 debug_list = []
@@ -127,23 +150,13 @@ while running:
         # saves herbivore count and population statistics to csv file
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_c:
-                dict_to_df = {
-                    'time': time_list,
-                    'num-herbivores': num_herbivores,
-                    'num-carnivores': num_carnivores,
-                    'speed': avg_speed,
-                    'turn-speed': avg_turn_speed,
-                    'fov': avg_fov,
-                    'view-dist': avg_view_dist,
-                    'max-energy': avg_max_energy,
-                    'metabolism-rate': avg_metabolism_rate,
-                    'find-mate-rate': avg_find_mate_rate,
-                    'max-desire-to-mate': avg_max_desire_to_mate
-                    }
-                df = pd.DataFrame(dict_to_df)
-                location = location = 'tests/testopen/data.csv'
-                df.to_csv(location)
-            
+                simulation.save_data()
+
+        # saves a checkpoint to start later runs from, see checkpoint.py
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_k:
+                checkpoint_writer.save(simulation, args.checkpoint)
+
         if event.type == pygame.MOUSEBUTTONUP: # checks for mouse clicks
             mouse_pos = pygame.mouse.get_pos()
 
@@ -158,132 +171,63 @@ while running:
                         debug_list.remove(creature)
                 '''
 
+    step_time = 0
+    stepped = 0
     if not pause: # if not paused, run simulation
-        time_list.append(t)
-        herb_count = 0
-        carn_count = 0
-        for creature in creature_group:
-            if creature.ptype == 'prey':
-                herb_count += 1
-            elif creature.ptype == 'predator':
-                carn_count += 1
-        num_herbivores.append(herb_count)
-        num_carnivores.append(carn_count)
-
-        if herb_count == 0 or carn_count == 0:
-            running=False
-        # defining variables that will be summed up based on
-        # creature stats to be 0
-        speed = 0
-        turn_speed = 0
-        fov = 0
-        view_dist = 0
-        max_energy = 0
-        metabolism_rate = 0
-        find_mate_rate = 0
-        max_desire_to_mate = 0
-
-        # looping through every creature and adding its gene
-        # values to the respective variable
-        for creature in creature_group:
-            if creature.ptype == 'prey':
-                speed += np.mean(creature.genes['speed'])
-                turn_speed += np.mean(creature.genes['turn-speed'])
-                fov += np.mean(creature.genes['fov'])
-                view_dist += np.mean(creature.genes['view-dist'])
-                max_energy += np.mean(creature.genes['max-energy'])
-                metabolism_rate += np.mean(creature.genes['metabolism-rate'])
-                find_mate_rate += np.mean(creature.genes['find-mate-rate'])
-                max_desire_to_mate += np.mean(creature.genes['max-desire-to-mate'])
-
-        # appending the averaged genes to the appropriate list
-        n = len(creature_group)
-        if n > 0:
-            avg_speed.append(speed/n)
-            avg_turn_speed.append(turn_speed/n)
-            avg_fov.append(fov/n)
-            avg_view_dist.append(view_dist/n)
-            avg_max_energy.append(max_energy/n)
-            avg_metabolism_rate.append(metabolism_rate/n)
-            avg_find_mate_rate.append(find_mate_rate/n)
-            avg_max_desire_to_mate.append(max_desire_to_mate/n)
-        else:
-            avg_speed.append(0)
-            avg_turn_speed.append(0)
-            avg_fov.append(0)
-            avg_view_dist.append(0)
-            avg_max_energy.append(0)
-            avg_metabolism_rate.append(0)
-            avg_find_mate_rate.append(0)
-            avg_max_desire_to_mate.append(0)
-        
-        
-        env_cell_group.update(env_grid) # calls update function for every element in group
-        env_grid = advance_grid(env_grid, dt) # advances the grass grid by the growth rules
-
-        creature_group.update(env_grid, hashing_grid, dt, creature_group) # calls update funciton for every organism
-
-        env_cell_group.draw(screen) # calls draw function for every environment grass cell
-        creature_group.draw(screen) # calls draw function for every organism
-
-        t += 0.001 # counter for plots
-
-        # used for automatically saving data to csv every 1000 frames
-        if plot_timer % 1000 == 0:
-            dict_to_df = {
-                'time': time_list,
-                'num-herbivores': num_herbivores,
-                'num-carnivores': num_carnivores,
-                'speed': avg_speed,
-                'turn-speed': avg_turn_speed,
-                'fov': avg_fov,
-                'view-dist': avg_view_dist,
-                'max-energy': avg_max_energy,
-                'metabolism-rate': avg_metabolism_rate,
-                'find-mate-rate': avg_find_mate_rate,
-                'max-desire-to-mate': avg_max_desire_to_mate
-                }
-            df = pd.DataFrame(dict_to_df)
-            location = location = 'tests/testopen/data.csv'
-            df.to_csv(location)
-        plot_timer += 1
-
-    if pause: # if paused only draw, no update
-        env_cell_group.draw(screen) # calls draw function for every environment grass cell
-        creature_group.draw(screen) # calls draw function for every organism
+        steps = steps_per_frame
+        if args.ticks is not None:
+            steps = min(steps, args.ticks - ticks)
+        step_start = time.perf_counter()
+        stepped = simulation.fast_forward(dt, steps)
+        step_time = time.perf_counter() - step_start
+        ticks += stepped
+        if simulation.extinct() or (args.ticks is not None and ticks >= args.ticks):
+            running = False
+
+    # if paused only draw, no update
+    profiler.start()
+    simulation.draw(screen)
 
     # PUT DEBUG DRAW INSTRUCTIONS HERE
     for creature in debug_list:
         creature.debug(screen, debug_list)
 
     font = pygame.font.Font('freesansbold.ttf', 16)
-    words = 'Time: ' + str(round(t,3))
+    words = 'Time: ' + str(round(simulation.t,3))
+    if steps_per_frame > 1 or auto_steps:
+        words += '  x' + str(steps_per_frame) + (' auto' if auto_steps else '')
     #words = 'FPS: ' + str(clock.get_fps())
     text = font.render(words, True, (255,255,255), (0,0,0))
     textrect = text.get_rect()
     textrect.topright = (1290,10)
     screen.blit(text, textrect)
-        
+
+    if show_profile:
+        profiler.draw(screen, profile_font)
+    profiler.lap('draw')
+
     pygame.display.flip() # updates the pygame display
-    
+    profiler.lap('flip')
+    profiler.end_frame(simulation, stepped)
+
+    # picks the steps per frame that would have left time to draw within
+    # the frame budget, changing by at most double or half at a time so it
+    # settles smoothly
+    frame_end = time.perf_counter()
+    if auto_steps and stepped > 0:
+        draw_time = frame_end - frame_start - step_time
+        budget = max(1/args.target_fps - draw_time, 0)
+        wanted = int(budget / (step_time/stepped))
+        steps_per_frame = min(max(wanted, steps_per_frame // 2, 1), 2*steps_per_frame, max_steps_per_frame)
+    frame_start = frame_end
+
 
 pygame.quit() # quits pygame module
 
-dict_to_df = {
-    'time': time_list,
-    'num-herbivores': num_herbivores,
-    'num-carnivores': num_carnivores,
-    'speed': avg_speed,
-    'turn-speed': avg_turn_speed,
-    'fov': avg_fov,
-    'view-dist': avg_view_dist,
-    'max-energy': avg_max_energy,
-    'metabolism-rate': avg_metabolism_rate,
-    'find-mate-rate': avg_find_mate_rate,
-    'max-desire-to-mate': avg_max_desire_to_mate
-    }
-df = pd.DataFrame(dict_to_df)
-location = location = 'tests/testopen/data.csv'
-df.to_csv(location)
-
-sys.exit() # exits program
\ No newline at end of file
+if args.cache_report:
+    print(cache_report())
+
+simulation.close()
+checkpoint_writer.close()
+
+sys.exit() # exits program
@@ -0,0 +1,747 @@
+import multiprocessing
+import numpy as np
+import os
+import rng
+import warnings
+
+from multiprocessing import shared_memory
+
+from ensemble import population_settings, random_creatures
+from environment import advance_grid, max_grass
+from genetics import gene_index
+from population import Population
+from sensing import candidate_pairs, nearest_targets
+from simulation import default_settings, initial_gene_ranges
+
+# Steps very large worlds on several cores. The board is split into tiles,
+# vertical strips of whole grass cells, and every tile has its own prey and
+# predator Population. All of the arrays live in shared memory, so the
+# worker processes read and write them directly and nothing but the tile
+# number is sent to them each frame. A frame has four phases:
+#
+# 1. sense: every tile finds the targets of its creatures. Creatures can see
+#    into the tiles on either side (the halo), which are only read. Each
+#    target is saved as its tile and its index in that tile.
+# 2. borders: the main process carries out the hunting and mating where
+#    the target is in another tile, one tile after another. Children are
+#    added to their mother's tile.
+# 3. step: every tile carries out the hunting and mating inside it, grows
+#    its strip of grass and steps its creatures with Population.tick.
+#    Grass is double buffered, the new grid is written while the old one is
+#    read, so the cells next to a tile's border see the same values the
+#    other tile saw.
+# 4. migrate: the main process moves creatures that walked out of their
+#    tile into the tile they walked into.
+#
+# Tiles only ever write to their own rows of the arrays in the phases run
+# by the workers, so they don't need any locks. The world steps the same
+# rules as Ensemble.step, a prey is eaten by the first predator that caught
+# it and a female accepts the first male, with the ones from other tiles
+# going first.
+
+# Set in each worker process by attach, and in the main process when
+# stepping without a pool
+world = None
+
+def shared_array(shape, dtype, name=None):
+    """
+    Creates a numpy array in a new block of shared memory, or attaches to
+    an existing block if name is given.
+
+    Args:
+    - shape (tuple): Shape of the array.
+    - dtype (numpy.dtype): Type of the array.
+    - name (str): Name of an existing block to attach to.
+
+    Returns:
+    - tuple: (block, array). The block has to be kept around as long as the
+      array is used.
+    """
+    size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+    if name is None:
+        block = shared_memory.SharedMemory(create=True, size=size)
+    else:
+        block = shared_memory.SharedMemory(name=name)
+    array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    return block, array
+
+class Tile_Arrays:
+    """
+    Every array of a tiled world, in shared memory. The main process
+    creates the blocks and the workers attach to them using layout. Every
+    Population field is one block with a row of capacity creatures per
+    tile, so tile t's Population is backed by row t of each
+    """
+    def __init__(self, layout, create=False):
+        """
+        Creates or attaches to the shared arrays.
+
+        Args:
+        - layout (dict): Sizes of the world, see Tiled_World.
+        - create (bool): If True the blocks are created and filled with
+          zeros, otherwise they're attached to by the names in layout.
+        """
+        self.layout = layout
+        self.blocks = []
+        num_tiles = layout['num_tiles']
+        capacity = layout['capacity']
+        names = layout.get('names', {})
+
+        def array(key, shape, dtype):
+            block, array = shared_array(shape, dtype, None if create else names[key])
+            if create:
+                array.fill(0)
+                names[key] = block.name
+            self.blocks.append(block)
+            return array
+
+        # two grass grids, one read and one written every frame
+        self.grass = array('grass', (2,) + layout['grid_shape'], np.float64)
+        self.populations = {}
+        self.counts = {}
+        self.next_uid = {}
+        self.targets = {} # position of every creature's target, nan for none
+        self.target_tile = {} # tile the target is in, -1 for none
+        self.target_index = {} # index of the target in its tile
+        for ptype in layout['ptypes']:
+            # fields of Population, same for every species
+            fields = Population(ptype, capacity=1).fields
+            buffers = {
+                name: array((ptype, name), (num_tiles, capacity) + shape, dtype)
+                for name, (shape, dtype) in fields.items()
+                }
+            self.counts[ptype] = array((ptype, 'count'), (num_tiles,), np.int64)
+            self.next_uid[ptype] = array((ptype, 'next_uid'), (num_tiles,), np.int64)
+            self.targets[ptype] = array((ptype, 'targets'), (num_tiles, capacity, 2), np.float64)
+            self.target_tile[ptype] = array((ptype, 'target_tile'), (num_tiles, capacity), np.int64)
+            self.target_index[ptype] = array((ptype, 'target_index'), (num_tiles, capacity), np.int64)
+            self.populations[ptype] = []
+            for t in range(num_tiles):
+                population = Population(
+                    ptype, capacity, layout['width'], layout['height'],
+                    buffers={name: buffer[t] for name, buffer in buffers.items()}
+                    )
+                population.settings.update(layout['settings'][ptype])
+                self.populations[ptype].append(population)
+        if create:
+            layout['names'] = names
+
+    def population(self, ptype, tile):
+        """
+        Returns the Population of one species in one tile, with its count
+        and next uid read from shared memory. Call store when done with it.
+
+        Args:
+        - ptype (str): 'prey' or 'predator'.
+        - tile (int): The tile.
+
+        Returns:
+        - Population: The population.
+        """
+        population = self.populations[ptype][tile]
+        population.count = int(self.counts[ptype][tile])
+        population.next_uid = int(self.next_uid[ptype][tile])
+        return population
+
+    def store(self, population, tile):
+        """
+        Writes the count and next uid of a population back to shared memory.
+
+        Args:
+        - population (Population): The population.
+        - tile (int): The tile it belongs to.
+
+        Returns:
+        - None
+        """
+        self.counts[population.ptype][tile] = population.count
+        self.next_uid[population.ptype][tile] = population.next_uid
+
+    def close(self, unlink=False):
+        """
+        Detaches from the shared memory.
+
+        Args:
+        - unlink (bool): If True the blocks are also freed. Only the main
+          process should do this, once the workers are done.
+
+        Returns:
+        - None
+        """
+        # the arrays point into the blocks, so they have to go first
+        self.grass = self.populations = self.counts = self.next_uid = None
+        self.targets = self.target_tile = self.target_index = None
+        for block in self.blocks:
+            block.close()
+            if unlink:
+                block.unlink()
+        self.blocks = []
+
+def attach(layout):
+    """
+    Pool initializer. Attaches the worker process to the shared arrays.
+
+    Args:
+    - layout (dict): Layout of the world, with the block names.
+
+    Returns:
+    - None
+    """
+    global world
+    world = Tile_Arrays(layout)
+
+def tile_columns(layout, tile, halo=0):
+    """
+    First and last + 1 grass columns of a tile, widened by halo tiles on
+    each side and clipped to the board.
+
+    Args:
+    - layout (dict): Layout of the world.
+    - tile (int): The tile.
+    - halo (int): Number of tiles to add on each side.
+
+    Returns:
+    - tuple: (start, end) columns.
+    """
+    edges = layout['tile_edges']
+    start = edges[max(tile - halo, 0)]
+    end = edges[min(tile + halo + 1, layout['num_tiles'])]
+    return start, end
+
+def sense_tile(task):
+    """
+    Phase 1 of a frame for one tile. Finds the target of every creature in
+    the tile, looking through its own tile and the ones on either side.
+    Targets are written to the shared targets, target_tile and
+    target_index arrays.
+
+    Args:
+    - task (tuple): (tile, frame) numbers.
+
+    Returns:
+    - int: Number of (seeker, candidate) pairs checked.
+    """
+    tile, frame = task
+    layout = world.layout
+    cell_size = layout['cell_size']
+    neighbors = range(max(tile - 1, 0), min(tile + 2, layout['num_tiles']))
+
+    # creatures of every species in this tile and its halo, with the tile
+    # and index each one has there
+    halo = {}
+    for ptype in layout['ptypes']:
+        parts = [(t, world.population(ptype, t)) for t in neighbors]
+        halo[ptype] = {
+            'pos': np.concatenate([part.pos[:part.count] for t, part in parts]),
+            'sex': np.concatenate([part.sex[:part.count] for t, part in parts]),
+            'tile': np.concatenate([np.full(part.count, t) for t, part in parts]),
+            'index': np.concatenate([np.arange(part.count) for t, part in parts]),
+            }
+
+    pairs = 0
+    for ptype in layout['ptypes']:
+        population = world.population(ptype, tile)
+        n = population.count
+        targets = world.targets[ptype][tile, :n]
+        target_tile = world.target_tile[ptype][tile, :n]
+        target_index = world.target_index[ptype][tile, :n]
+        targets[:] = np.nan
+        target_tile[:] = -1
+        target_index[:] = -1
+        pos = population.pos[:n]
+        state = population.state[:n]
+        sex = population.sex[:n]
+
+        # (who is searching, creatures searched, which of them), mates are
+        # only looked for among the opposite sex
+        searching = []
+        others = halo[ptype]
+        for seeker_sex in (0, 1):
+            searching.append((
+                (state == 1) & (sex == seeker_sex), others, np.flatnonzero(others['sex'] != seeker_sex)
+                ))
+        if ptype == 'predator' and 'prey' in halo:
+            searching.append((state == 0, halo['prey'], np.arange(len(halo['prey']['pos']))))
+
+        for wanted, others, allowed in searching:
+            seeking = np.flatnonzero(wanted)
+            if len(seeking) == 0 or len(allowed) == 0:
+                continue
+            others_pos = others['pos'][allowed]
+            seekers, candidates = candidate_pairs(
+                pos[seeking], population.view_dist[seeking], others_pos, cell_size, layout['grid_shape']
+                )
+            nearest = nearest_targets(
+                pos[seeking], population.normal[seeking], population.fov[seeking]/2,
+                population.view_dist[seeking], others_pos, seekers, candidates
+                )
+            found = nearest >= 0
+            chosen = allowed[nearest[found]]
+            targets[seeking[found]] = others['pos'][chosen]
+            target_tile[seeking[found]] = others['tile'][chosen]
+            target_index[seeking[found]] = others['index'][chosen]
+            pairs += len(seekers)
+    return pairs
+
+def step_tile(task):
+    """
+    Phase 3 of a frame for one tile. Predators eat the prey they caught
+    and males mate with the females they reached, when those are in this
+    tile. Then grows the tile's grass columns into the other grass buffer
+    and steps its creatures with Population.tick. Prey graze from the new
+    buffer, only from cells in this tile since every creature is in its
+    own tile after the last migrate.
+
+    Args:
+    - task (tuple): (tile, frame, dt, read) where read is the grass
+      buffer to read from.
+
+    Returns:
+    - tuple: Number of prey eaten, creatures born and creatures that died.
+    """
+    tile, frame, dt, read = task
+    layout = world.layout
+    rng.seed((layout['seed'], frame, tile))
+
+    # targets in this tile, the ones in other tiles were dealt with by
+    # the main process
+    populations = {}
+    in_tile = {}
+    targets = {}
+    for ptype in layout['ptypes']:
+        population = world.population(ptype, tile)
+        n = population.count
+        populations[ptype] = population
+        in_tile[ptype] = np.where(
+            world.target_tile[ptype][tile, :n] == tile, world.target_index[ptype][tile, :n], -1
+            )
+        # children born below don't have a target, see Population.steer
+        targets[ptype] = world.targets[ptype][tile, :n]
+    eaten = 0
+    if 'prey' in populations and 'predator' in populations:
+        eaten = populations['predator'].hunt(populations['prey'], in_tile['predator'])
+    born = 0
+    for ptype, population in populations.items():
+        born += len(population.mate(in_tile[ptype]))
+
+    # one column of halo is enough for the grass growth rules
+    start, end = tile_columns(layout, tile)
+    halo_start, halo_end = max(start - 1, 0), min(end + 1, layout['grid_shape'][1])
+    grown = advance_grid(world.grass[read][:, halo_start:halo_end], dt)
+    new_grid = world.grass[1 - read]
+    new_grid[:, start:end] = grown[:, start - halo_start:end - halo_start]
+
+    died = 0
+    for ptype, population in populations.items():
+        died += len(population.tick(dt, new_grid, targets[ptype], layout['cell_size']))
+        world.store(population, tile)
+    return eaten, born, died
+
+class Tiled_World:
+    """
+    A world of Populations split into tiles and stepped by a pool of
+    worker processes, for boards much larger than the window. Tiles are at
+    least as wide as halo_dist so creatures never need to see past the
+    tile next to theirs, and no creature can see farther than halo_dist
+    even if its view-dist genes evolve past it. Runs where that happens
+    aren't the same as an Ensemble's anymore, see view_dist_capped. The shared memory stays allocated until close is
+    called, so it's best used in a with block, which closes it however the
+    block ends
+    """
+    def __init__(self, width, height, cell_size=25, num_tiles=None, capacity=4096,
+                 processes=None, halo_dist=256, ptypes=('prey', 'predator'), seed=0, settings=None):
+        """
+        Creates the shared arrays and starts the worker processes.
+
+        Args:
+        - width (int): Width of the board in pixels.
+        - height (int): Height of the board in pixels.
+        - cell_size (int): Size of each environment cell.
+        - num_tiles (int): Number of tiles. Defaults to the number of
+          processes, fewer if the tiles would be narrower than halo_dist.
+        - capacity (int): Most creatures of each species one tile can hold.
+          Every field is allocated for all of them up front.
+        - processes (int): Number of worker processes. Defaults to the
+          number of cores. 0 steps every tile in this process.
+        - halo_dist (float): Farthest any creature can see. Longer view
+          distances are cut down to it.
+        - ptypes (tuple): Species in the world.
+        - seed (int): Seed for the random numbers of every tile and frame.
+          None picks a new random seed.
+        - settings (dict): Values to change from simulation.default_settings.
+        """
+        if processes is None:
+            processes = os.cpu_count()
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+        num_columns = int(width/cell_size)
+        num_rows = int(height/cell_size)
+        min_tile_columns = int(np.ceil(halo_dist/cell_size))
+        max_tiles = max(1, num_columns // min_tile_columns)
+        if num_tiles is None:
+            num_tiles = max(1, processes)
+        num_tiles = min(num_tiles, max_tiles)
+        self.settings = dict(default_settings, **(settings or {}))
+
+        self.layout = {
+            'width': width,
+            'height': height,
+            'cell_size': cell_size,
+            'grid_shape': (num_rows, num_columns),
+            'num_tiles': num_tiles,
+            'tile_edges': [int(edge) for edge in np.linspace(0, num_columns, num_tiles + 1)],
+            'capacity': capacity,
+            'ptypes': tuple(ptypes),
+            'seed': seed,
+            'settings': population_settings(self.settings),
+            }
+        for ptype in ptypes:
+            self.layout['settings'][ptype]['max-view-dist'] = halo_dist
+        self.pool = None
+        self.arrays = Tile_Arrays(self.layout, create=True)
+        try:
+            rng.seed(seed) # for the creatures added before the first frame
+            self.arrays.grass[0] = max_grass
+            self.read = 0
+            self.frame = 0
+
+            # uids are unique across tiles, every tile hands out its own range
+            for ptype in ptypes:
+                self.arrays.next_uid[ptype][:] = np.arange(num_tiles) * (1 << 40)
+
+            if processes > 0:
+                # forked where possible, so the workers don't run the
+                # script that made the world (like main.py) again
+                if 'fork' in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context('fork')
+                else:
+                    context = multiprocessing.get_context()
+                self.pool = context.Pool(processes, initializer=attach, initargs=(self.layout,))
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        self.close()
+
+    @property
+    def grid(self):
+        """
+        The current grass grid.
+        """
+        return self.arrays.grass[self.read]
+
+    def tile_of(self, pos):
+        """
+        Tile every position is in.
+
+        Args:
+        - pos (numpy.ndarray): (n, 2) positions.
+
+        Returns:
+        - numpy.ndarray: The tile of each position.
+        """
+        num_columns = self.layout['grid_shape'][1]
+        column = np.clip((pos[:, 0]/self.layout['cell_size']).astype(np.int64), 0, num_columns - 1)
+        return np.searchsorted(self.layout['tile_edges'], column, side='right') - 1
+
+    def add(self, ptype, genomes, pos, angle, age=None):
+        """
+        Adds creatures, each to the tile it's standing in.
+
+        Args:
+        - ptype (str): 'prey' or 'predator'.
+        - genomes (numpy.ndarray): Array of shape (n, 12, 2) of genomes.
+        - pos (numpy.ndarray): Array of shape (n, 2) of positions.
+        - angle (numpy.ndarray): Array of n starting orientation angles.
+        - age (numpy.ndarray): Array of n starting ages. Defaults to 0.
+
+        Returns:
+        - None
+        """
+        pos = np.asarray(pos, dtype=float)
+        tiles = self.tile_of(pos)
+        for tile in np.unique(tiles):
+            here = tiles == tile
+            population = self.arrays.population(ptype, tile)
+            population.add(
+                np.asarray(genomes)[here], pos[here], np.asarray(angle)[here],
+                None if age is None else np.asarray(age)[here]
+                )
+            self.arrays.store(population, tile)
+
+    def populate(self, num_prey=None, num_predators=None, gene_ranges=None):
+        """
+        Adds starting creatures picked the same way as Simulation.populate,
+        spread over the whole board.
+
+        Args:
+        - num_prey (int): Number of prey. Defaults to the num-prey setting.
+        - num_predators (int): Number of predators. Defaults to the
+          num-predators setting.
+        - gene_ranges (dict): Ranges to change from initial_gene_ranges,
+          keyed by species and then gene.
+
+        Returns:
+        - None
+        """
+        counts = {
+            'prey': (self.settings['num-prey'] if num_prey is None else num_prey, 200),
+            'predator': (self.settings['num-predators'] if num_predators is None else num_predators, 400),
+            }
+        for ptype in self.layout['ptypes']:
+            count, max_start_age = counts[ptype]
+            ranges = dict(initial_gene_ranges[ptype], **(gene_ranges or {}).get(ptype, {}))
+            genomes, pos, angle, age = random_creatures(
+                ranges, count, max_start_age, self.layout['width'], self.layout['height'], rng.setup
+                )
+            self.add(ptype, genomes, pos, angle, age)
+
+    def run_phase(self, function, tasks):
+        """
+        Runs one phase on every tile, in the pool or in this process.
+
+        Args:
+        - function (function): sense_tile or step_tile.
+        - tasks (list): One task per tile.
+
+        Returns:
+        - list: What function returned for each tile.
+        """
+        global world
+        if self.pool is not None:
+            return self.pool.map(function, tasks)
+        world = self.arrays
+        return [function(task) for task in tasks]
+
+    def cross_borders(self):
+        """
+        Phase 2 of a frame. Carries out the hunting and mating of every
+        creature whose target is in another tile, going through the tiles
+        in order. Runs in the main process since it writes to two tiles
+        at once. Its random numbers come from (seed, frame, num_tiles), so
+        they're the same whether or not there's a pool.
+
+        Args:
+        - None
+
+        Returns:
+        - tuple: Number of prey eaten and creatures born.
+        """
+        layout = self.layout
+        arrays = self.arrays
+        rng.seed((layout['seed'], self.frame, layout['num_tiles']))
+        eaten = 0
+        born = 0
+        for tile in range(layout['num_tiles']):
+            for ptype in layout['ptypes']:
+                seekers = arrays.population(ptype, tile)
+                n = seekers.count
+                target_tile = arrays.target_tile[ptype][tile, :n]
+                target_index = arrays.target_index[ptype][tile, :n]
+                for other in np.unique(target_tile[(target_tile >= 0) & (target_tile != tile)]).tolist():
+                    index = np.where(target_tile == other, target_index, -1)
+                    if ptype == 'predator' and 'prey' in layout['ptypes']:
+                        eaten += seekers.hunt(arrays.population('prey', other), index)
+
+                    # children don't have a target until the next frame
+                    females = arrays.population(ptype, other)
+                    children = seekers.mate(index, females)
+                    arrays.targets[ptype][other, children] = np.nan
+                    arrays.target_tile[ptype][other, children] = -1
+                    arrays.target_index[ptype][other, children] = -1
+                    arrays.store(females, other)
+                    born += len(children)
+                arrays.store(seekers, tile)
+        return eaten, born
+
+    def migrate(self):
+        """
+        Phase 4 of a frame. Moves every creature that left its tile into
+        the tile it's in now. All the creatures leaving any tile are taken
+        out first, then put in their new tiles.
+
+        Args:
+        - None
+
+        Returns:
+        - int: Number of creatures that moved tiles.
+        """
+        moved = 0
+        for ptype in self.layout['ptypes']:
+            leaving = []
+            for tile in range(self.layout['num_tiles']):
+                population = self.arrays.population(ptype, tile)
+                tiles = self.tile_of(population.pos[:population.count])
+                out = tiles != tile
+                if out.any():
+                    leaving.append((tiles[out], population.take(out)))
+                    self.arrays.store(population, tile)
+
+            for tiles, taken in leaving:
+                moved += len(tiles)
+                for tile in np.unique(tiles):
+                    here = tiles == tile
+                    population = self.arrays.population(ptype, tile)
+                    population.put({name: values[here] for name, values in taken.items()})
+                    self.arrays.store(population, tile)
+        return moved
+
+    def step(self, dt):
+        """
+        Steps the whole world by one frame. If anything goes wrong, in
+        this process or a worker, the world is closed before the error is
+        raised so the shared memory is never left behind.
+
+        Args:
+        - dt (float): The time step for the update.
+
+        Returns:
+        - dict: Number of candidate pairs checked, prey eaten, creatures
+          born, creatures that died and creatures that moved tiles.
+        """
+        try:
+            tiles = range(self.layout['num_tiles'])
+            pairs = self.run_phase(sense_tile, [(tile, self.frame) for tile in tiles])
+            eaten, born = self.cross_borders()
+            results = self.run_phase(step_tile, [(tile, self.frame, dt, self.read) for tile in tiles])
+            self.read = 1 - self.read
+            moved = self.migrate()
+            self.frame += 1
+        except BaseException:
+            self.close()
+            raise
+        return {
+            'pairs': sum(pairs),
+            'eaten': eaten + sum(result[0] for result in results),
+            'born': born + sum(result[1] for result in results),
+            'died': sum(result[2] for result in results),
+            'moved': moved,
+            }
+
+    def counts(self):
+        """
+        Number of creatures of each species in the world.
+
+        Args:
+        - None
+
+        Returns:
+        - dict: Count keyed by species.
+        """
+        return {ptype: int(self.arrays.counts[ptype].sum()) for ptype in self.layout['ptypes']}
+
+    def extinct(self):
+        """
+        Checks if any species died out.
+
+        Args:
+        - None
+
+        Returns:
+        - bool: True if a species has no creatures left.
+        """
+        return min(self.counts().values()) == 0
+
+    def view_dist_capped(self):
+        """
+        Counts the creatures whose genes give them a longer view distance
+        than halo_dist, which were cut down to it.
+
+        Args:
+        - None
+
+        Returns:
+        - int: Number of creatures.
+        """
+        capped = 0
+        for ptype in self.layout['ptypes']:
+            max_view_dist = self.layout['settings'][ptype]['max-view-dist']
+            for tile in range(self.layout['num_tiles']):
+                population = self.arrays.population(ptype, tile)
+                view_dist = population.genes[:population.count, gene_index['view-dist']].mean(axis=1)
+                capped += int((view_dist > max_view_dist).sum())
+        return capped
+
+    def statistics(self):
+        """
+        Row of the statistics time series for the current frame, with the
+        same columns as the one Simulation records (see
+        records.time_series_columns): the counts and the average prey genes.
+
+        Args:
+        - None
+
+        Returns:
+        - list: Values in the order of time_series_columns.
+        """
+        counts = self.counts()
+        fields = ('speed', 'turn_speed', 'fov', 'view_dist', 'max_energy', 'metabolism_rate',
+                  'find_mate_rate', 'max_desire')
+        sums = np.zeros(len(fields))
+        if 'prey' in counts:
+            for tile in range(self.layout['num_tiles']):
+                prey = self.arrays.population('prey', tile)
+                sums += [getattr(prey, name)[:prey.count].sum() for name in fields]
+        averages = (sums/counts['prey']).tolist() if counts.get('prey') else [0]*len(fields)
+        return [self.frame*0.001, counts.get('prey', 0), counts.get('predator', 0)] + averages
+
+    def run(self, dt, max_ticks=None, time_series=None):
+        """
+        Steps until a species dies out or max_ticks frames have run, like
+        Simulation.run. Warns the first time a creature's view distance is
+        cut down to halo_dist, see view_dist_capped.
+
+        Args:
+        - dt (float): Time step for every frame.
+        - max_ticks (int): Maximum number of frames. None runs until a
+          species dies out.
+        - time_series (Time_Series_Writer): Optional writer every frame's
+          statistics are added to, see statistics.
+
+        Returns:
+        - int: Number of frames that were run.
+        """
+        ticks = 0
+        warned = False
+        while max_ticks is None or ticks < max_ticks:
+            if time_series is not None:
+                time_series.append(self.statistics())
+            self.step(dt)
+            ticks += 1
+            if not warned:
+                capped = self.view_dist_capped()
+                if capped:
+                    warnings.warn('{} creatures can see past halo_dist at frame {}, their view distance is cut down to it'.format(
+                        capped, self.frame))
+                    warned = True
+            if self.extinct():
+                break
+        return ticks
+
+    def close(self):
+        """
+        Stops the workers and frees the shared memory. Can be called more
+        than once.
+
+        Args:
+        - None
+
+        Returns:
+        - None
+        """
+        global world
+        if self.pool is not None:
+            # the workers have nothing left to finish between frames
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        if self.arrays is None:
+            return
+        if world is self.arrays:
+            world = None
+        self.arrays.close(unlink=True)
+        self.arrays = None
@@ -0,0 +1,715 @@
+import numpy as np
+import rng
+
+from genetics import *
+from sensing import candidate_pairs, nearest_targets
+
+# Constants that differ between the Herbivore and Carnivore classes
+species_settings = {
+    'prey': {
+        'hunger-threshold': 0.28, # fraction of max energy that makes it hungry
+        'maturity': 50,
+        'max-age': (900, 1100),
+        'litter-size': 2,
+        'grass-energy-divisor': 5, # energy gained is the grass eaten divided by this
+        'max-view-dist': None, # farthest a creature can see whatever its genes say, None for no limit
+        },
+    'predator': {
+        'hunger-threshold': 0.5,
+        'maturity': 200,
+        'max-age': (900, 1100),
+        'litter-size': 1,
+        'max-view-dist': None,
+        },
+    }
+
+class Population:
+    """
+    Stores every creature of one species as a structure of arrays instead
+    of one sprite object per creature. Field i of every array belongs to
+    creature i, and only the first count entries are alive. The tick method
+    steps all of them at once with the same rules as the Herbivore and
+    Carnivore update functions
+    """
+    def __init__(self, ptype, capacity=1024, width=1300, height=600, buffers=None):
+        """
+        Initializes an empty population.
+
+        Args:
+        - ptype (str): 'prey' or 'predator'.
+        - capacity (int): Number of creatures to allocate room for. Grows
+          automatically when more are added.
+        - width (int): Width of the board in pixels.
+        - height (int): Height of the board in pixels.
+        - buffers (dict): Optional arrays to store the fields in instead of
+          allocating new ones, keyed by field name, each with capacity rows.
+          Used for shared memory (see parallel.py). The population can't
+          grow past capacity when they're given.
+        """
+        self.ptype = ptype
+        self.settings = dict(species_settings[ptype])
+        self.width = width
+        self.height = height
+        self.count = 0
+        self.next_uid = 0
+        # rng.World_Streams every world draws its own random numbers from,
+        # None draws from the shared streams in rng.py
+        self.streams = None
+
+        self.can_mate_counter_limit = 30
+
+        self.fields = {
+            # genome and the values expressed from it
+            'genes': ((len(gene_names), 2), np.float64),
+            'speed': ((), np.float64),
+            'turn_speed': ((), np.float64),
+            'fov': ((), np.float64),
+            'view_dist': ((), np.float64),
+            'max_energy': ((), np.float64),
+            'metabolism_rate': ((), np.float64),
+            'find_mate_rate': ((), np.float64),
+            'max_desire': ((), np.float64),
+            'sex': ((), np.int8),
+            # position information
+            'pos': ((2,), np.float64),
+            'angle': ((), np.float64),
+            'normal': ((2,), np.float64),
+            # state variables
+            'uid': ((), np.int64),
+            'energy': ((), np.float64),
+            'desire_mate': ((), np.float64),
+            'can_mate': ((), np.bool_),
+            'can_mate_counter': ((), np.int32),
+            'dead': ((), np.bool_),
+            'age': ((), np.float64),
+            'max_age': ((), np.float64),
+            # state machine
+            'state': ((), np.int8),
+            'doing': ((), np.bool_),
+            'counter': ((), np.int32),
+            'counter_max': ((), np.int32),
+            'random_target': ((2,), np.float64),
+            # which world it lives in, when many worlds share the arrays (see ensemble.py)
+            'world': ((), np.int32),
+            }
+        self.fixed_capacity = buffers is not None
+        for name, (shape, dtype) in self.fields.items():
+            if buffers is None:
+                setattr(self, name, np.zeros((capacity,) + shape, dtype=dtype))
+            else:
+                setattr(self, name, buffers[name])
+
+    def __len__(self):
+        return self.count
+
+    def grow(self, capacity):
+        """
+        Makes room for at least capacity creatures, doubling the arrays so
+        adding creatures one at a time doesn't copy every time.
+
+        Args:
+        - capacity (int): Number of creatures that need to fit.
+
+        Returns:
+        - None
+        """
+        old_capacity = len(self.energy)
+        if capacity <= old_capacity:
+            return
+        if self.fixed_capacity:
+            raise ValueError('Population is full, it has room for {} creatures'.format(old_capacity))
+        new_capacity = max(capacity, 2*old_capacity)
+        for name, (shape, dtype) in self.fields.items():
+            new_array = np.zeros((new_capacity,) + shape, dtype=dtype)
+            new_array[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, new_array)
+
+    def add(self, genomes, pos, angle, age=None, world=0):
+        """
+        Adds creatures to the population. Same starting values as a new
+        Herbivore or Carnivore object.
+
+        Args:
+        - genomes (numpy.ndarray): Array of shape (n, 12, 2) of genomes.
+        - pos (numpy.ndarray): Array of shape (n, 2) of positions.
+        - angle (numpy.ndarray): Array of n starting orientation angles.
+        - age (numpy.ndarray): Array of n starting ages. Defaults to 0.
+        - world (numpy.ndarray): Array of n worlds. Defaults to 0.
+
+        Returns:
+        - numpy.ndarray: Indices of the new creatures.
+        """
+        genomes = np.asarray(genomes, dtype=float).reshape(-1, len(gene_names), 2)
+        n = len(genomes)
+        start = self.count
+        self.grow(start + n)
+        new = slice(start, start + n)
+
+        self.genes[new] = genomes
+        expressed = genomes.mean(axis=2) # averaging value from both chromosomes
+        self.speed[new] = expressed[:, gene_index['speed']]
+        self.turn_speed[new] = expressed[:, gene_index['turn-speed']]
+        self.fov[new] = expressed[:, gene_index['fov']]
+        self.view_dist[new] = expressed[:, gene_index['view-dist']]
+        if self.settings['max-view-dist'] is not None:
+            self.view_dist[new] = np.minimum(self.view_dist[new], self.settings['max-view-dist'])
+        self.max_energy[new] = expressed[:, gene_index['max-energy']]
+        self.metabolism_rate[new] = expressed[:, gene_index['metabolism-rate']]
+        self.find_mate_rate[new] = expressed[:, gene_index['find-mate-rate']]
+        self.max_desire[new] = expressed[:, gene_index['max-desire-to-mate']]
+        self.sex[new] = expressed[:, gene_index['sex']] > 0 # 1 = male, 0 = female
+
+        self.pos[new] = pos
+        self.angle[new] = angle
+        self.normal[new, 0] = np.cos(self.angle[new])
+        self.normal[new, 1] = np.sin(self.angle[new])
+
+        self.uid[new] = np.arange(self.next_uid, self.next_uid + n)
+        self.next_uid += n
+        self.energy[new] = self.max_energy[new]
+        self.desire_mate[new] = 0
+        self.can_mate[new] = False
+        self.can_mate_counter[new] = 0
+        self.dead[new] = False
+        self.age[new] = 0 if age is None else age
+        self.world[new] = world
+        index = np.arange(start, start + n)
+        low, high = self.settings['max-age']
+        self.max_age[new] = self.random_integers('lifecycle', low, high, index)
+
+        self.state[new] = 3
+        self.doing[new] = False
+        self.counter[new] = 0
+        self.counter_max[new] = 500 # defines the counter for wandering in random direction
+        self.random_target[new] = self.random_points(index)
+
+        self.count += n
+        return index
+
+    def remove_dead(self):
+        """
+        Removes every dead creature, moving the living ones to the front of
+        the arrays. Keeps the creatures in the same order.
+
+        Args:
+        - None
+
+        Returns:
+        - numpy.ndarray: uids of the creatures that were removed.
+        """
+        dead = self.dead[:self.count]
+        if not dead.any():
+            return np.zeros(0, dtype=np.int64)
+        return self.take(dead)['uid']
+
+    def take(self, mask):
+        """
+        Removes the creatures selected by mask and returns their fields.
+        The ones left are moved to the front of the arrays and keep their
+        order.
+
+        Args:
+        - mask (numpy.ndarray): count booleans, True for the creatures to remove.
+
+        Returns:
+        - dict: Array of every field of the removed creatures, keyed by field name.
+        """
+        keep = ~mask
+        n = int(keep.sum())
+        taken = {}
+        for name in self.fields:
+            array = getattr(self, name)
+            taken[name] = array[:self.count][mask]
+            array[:n] = array[:self.count][keep]
+        self.count = n
+        return taken
+
+    def put(self, taken):
+        """
+        Adds creatures returned by take, from this or another population
+        of the same species, keeping all of their fields.
+
+        Args:
+        - taken (dict): Array of every field keyed by field name.
+
+        Returns:
+        - numpy.ndarray: Indices of the added creatures.
+        """
+        n = len(taken['uid'])
+        start = self.count
+        self.grow(start + n)
+        for name in self.fields:
+            getattr(self, name)[start:start + n] = taken[name]
+        self.count += n
+        return np.arange(start, start + n)
+
+    def random_integers(self, name, low, high, index):
+        """
+        Draws a random whole number for every creature in index, from the
+        stream name in rng.py, or from the stream of each creature's world
+        when the population has streams.
+
+        Args:
+        - name (str): Name of the stream, like 'movement'.
+        - low (int): Lowest number.
+        - high (int): One past the highest number.
+        - index (numpy.ndarray): Indices of the creatures.
+
+        Returns:
+        - numpy.ndarray: One number per creature.
+        """
+        if self.streams is None:
+            return getattr(rng, name).integers(low, high, size=len(index))
+        return self.streams.integers(name, low, high, self.world[index])
+
+    def random_points(self, index):
+        """
+        Picks random points on the board for creatures to wander toward.
+
+        Args:
+        - index (numpy.ndarray): Indices of the creatures that need one.
+
+        Returns:
+        - numpy.ndarray: Array of shape (n, 2) of points.
+        """
+        points = np.empty((len(index), 2))
+        points[:, 0] = self.random_integers('movement', 10, self.width - 10, index)
+        points[:, 1] = self.random_integers('movement', 10, self.height - 10, index)
+        return points
+
+    def gametes(self, parents, population=None):
+        """
+        Makes one gamete for every parent, see genetics.form_gametes. With
+        streams, the gametes of each world are made from its own stream.
+
+        Args:
+        - parents (numpy.ndarray): Indices of the parents, can repeat.
+        - population (Population): Population the parents are in. Defaults
+          to this one.
+
+        Returns:
+        - numpy.ndarray: Array of shape (n, 12) of gametes.
+        """
+        if population is None:
+            population = self
+        if self.streams is None:
+            return form_gametes(population.genes[parents])
+        gametes = np.empty((len(parents), len(gene_names)))
+        worlds = population.world[parents]
+        for world in np.unique(worlds).tolist():
+            here = np.flatnonzero(worlds == world)
+            gametes[here] = form_gametes(population.genes[parents[here]], self.streams.stream(world, 'genetics'))
+        return gametes
+
+    def update_state(self):
+        """
+        Vectorized version of update_state. Burns energy, builds up desire
+        to mate and picks every creature's state.
+
+        Args:
+        - None
+
+        Returns:
+        - None
+        """
+        n = self.count
+        energy = self.energy[:n]
+        desire_mate = self.desire_mate[:n]
+        can_mate = self.can_mate[:n]
+        doing = self.doing[:n]
+        state = self.state[:n]
+        max_energy = self.max_energy[:n]
+
+        energy -= self.metabolism_rate[:n]
+        starved = energy <= 0
+        energy[starved] = 0
+        self.dead[:n] |= starved
+
+        desire_mate += self.find_mate_rate[:n]
+        np.minimum(desire_mate, self.max_desire[:n], out=desire_mate)
+
+        hunger = max_energy - energy
+        mature = self.age[:n] >= self.settings['maturity']
+
+        hungry = (hunger >= desire_mate) & (energy <= self.settings['hunger-threshold']*max_energy)
+        state[hungry] = 0
+        doing |= hungry
+
+        wants_mate = hunger < desire_mate
+        state[wants_mate & ~doing & can_mate & mature] = 1
+
+        resting = wants_mate & ~doing & ~can_mate
+        state[resting] = 3
+        # rest period between mating, only counts for mature creatures
+        counting = resting & mature
+        ready = counting & (self.can_mate_counter[:n] >= self.can_mate_counter_limit)
+        can_mate[ready] = True
+        self.can_mate_counter[:n][ready] = 0
+        self.can_mate_counter[:n][counting & ~ready] += 1
+
+    def graze(self, grid, cell_size=25):
+        """
+        Hungry prey eat all the grass in the cell they are standing on. When
+        more than one is in the same cell, the first one in the arrays gets
+        the grass, same as when the sprites are updated one at a time.
+
+        Args:
+        - grid (numpy.ndarray): The grid of grass. Eaten cells are set to 0.
+          Can be a (worlds, rows, columns) batch of grids, indexed by the
+          creatures' worlds.
+        - cell_size (int): Size of each environment cell.
+
+        Returns:
+        - None
+        """
+        n = self.count
+        eating = np.flatnonzero(self.state[:n] == 0)
+        if len(eating) == 0:
+            return
+        # clipped since the board doesn't have to be a whole number of cells
+        column = np.clip((self.pos[eating, 0]/cell_size).astype(int), 0, grid.shape[-1] - 1)
+        row = np.clip((self.pos[eating, 1]/cell_size).astype(int), 0, grid.shape[-2] - 1)
+        cells = (self.world[eating].astype(np.int64)*grid.shape[-2] + row)*grid.shape[-1] + column
+
+        # only the first creature in each cell gets the grass
+        _, first = np.unique(cells, return_index=True)
+        grass_amount = np.zeros(len(eating))
+        grass_amount[first] = grid.flat[cells[first]]
+        grid.flat[cells] = 0
+
+        energy = self.energy[eating] + grass_amount/self.settings['grass-energy-divisor']
+        full = energy >= self.max_energy[eating]
+        energy[full] = self.max_energy[eating][full]
+        self.energy[eating] = energy
+        self.doing[eating[full]] = False
+
+    def find_targets(self, prey=None, cell_size=25):
+        """
+        Vectorized version of the mate search and hunting in act. Creatures
+        looking for a mate (state 1) target the nearest creature of the
+        opposite sex they can see. If prey is given, hungry predators
+        (state 0) target the nearest prey they can see. Creatures only see
+        the ones in their own world.
+
+        Args:
+        - prey (Population): Population hungry predators hunt in.
+        - cell_size (int): Size of the grid cells used to find candidates.
+
+        Returns:
+        - tuple: (targets, target_index). targets is an array of shape
+          (count, 2) of points to steer toward with nan rows for creatures
+          without a target, see steer. target_index is the index of each
+          target in its population, -1 for none.
+        """
+        n = self.count
+        shape = (int(np.ceil(self.height/cell_size)), int(np.ceil(self.width/cell_size)))
+        targets = np.full((n, 2), np.nan)
+        target_index = np.full(n, -1, dtype=np.int64)
+        pos = self.pos[:n]
+        normal = self.normal[:n]
+        half_fov = self.fov[:n]/2
+        view_dist = self.view_dist[:n]
+        world = self.world[:n]
+
+        # (who is searching, population searched, which of its creatures),
+        # mates are only looked for among the opposite sex
+        sex = self.sex[:n]
+        searching = [
+            ((self.state[:n] == 1) & (sex == seeker_sex), self, np.flatnonzero(sex != seeker_sex))
+            for seeker_sex in (0, 1)
+            ]
+        if prey is not None and self.ptype == 'predator':
+            searching.append((self.state[:n] == 0, prey, np.arange(prey.count)))
+
+        for wanted, others, allowed in searching:
+            seeking = np.flatnonzero(wanted)
+            if len(seeking) == 0 or len(allowed) == 0:
+                continue
+            seekers, candidates = candidate_pairs(
+                pos[seeking], view_dist[seeking], others.pos[allowed], cell_size, shape,
+                world[seeking], others.world[allowed]
+                )
+            nearest = nearest_targets(
+                pos[seeking], normal[seeking], half_fov[seeking], view_dist[seeking],
+                others.pos[allowed], seekers, candidates
+                )
+            found = nearest >= 0
+            target_index[seeking[found]] = allowed[nearest[found]]
+            targets[seeking[found]] = others.pos[allowed[nearest[found]]]
+        return targets, target_index
+
+    def hunt(self, prey, target_index):
+        """
+        Vectorized version of eating in Simulation.commit. Hungry predators
+        within 40 of the prey they're chasing eat it. When more than one
+        caught the same prey, the first one in the arrays gets it. Eaten
+        prey are marked dead and removed at the end of their tick.
+
+        Args:
+        - prey (Population): The prey population.
+        - target_index (numpy.ndarray): Index of each creature's target in
+          prey, from find_targets.
+
+        Returns:
+        - int: Number of prey eaten.
+        """
+        n = self.count
+        hunters = np.flatnonzero((self.state[:n] == 0) & (target_index >= 0))
+        caught = target_index[hunters]
+        vec_to_target = prey.pos[caught] - self.pos[hunters]
+        close = np.hypot(vec_to_target[:, 0], vec_to_target[:, 1]) <= 40
+        close &= ~prey.dead[caught] # already eaten or starved
+        caught, first = np.unique(caught[close], return_index=True)
+        hunters = hunters[close][first]
+
+        self.energy[hunters] = np.minimum(self.energy[hunters] + 200, self.max_energy[hunters])
+        # full predators stop hunting, same as in Carnivore.eat_prey
+        full = self.energy[hunters] >= self.max_energy[hunters]
+        self.doing[hunters[full]] = False
+        prey.dead[caught] = True
+        return len(caught)
+
+    def mate(self, target_index, females=None):
+        """
+        Vectorized version of mating in act and Simulation.commit. Males
+        within 10 of the mate they're chasing ask her to mate, and she
+        accepts the first one if she's mature, can mate and is looking for
+        a mate. Every pair has a litter of children next to the mother,
+        their genomes made from one gamete of each parent (see
+        genetics.form_gametes).
+
+        Args:
+        - target_index (numpy.ndarray): Index of each creature's target in
+          females, from find_targets. -1 for none.
+        - females (Population): Population the targets are in, of the same
+          species. The children are added to it. Defaults to this one,
+          another one is only given when a world is split into tiles (see
+          parallel.py).
+
+        Returns:
+        - numpy.ndarray: Indices of the children in females.
+        """
+        if females is None:
+            females = self
+        n = self.count
+        males = np.flatnonzero(
+            (self.state[:n] == 1) & (self.sex[:n] == 1) & self.can_mate[:n] & (target_index >= 0)
+            )
+        mates = target_index[males]
+        vec_to_target = females.pos[mates] - self.pos[males]
+        close = np.hypot(vec_to_target[:, 0], vec_to_target[:, 1]) <= 10
+        males = males[close]
+        mates = mates[close]
+
+        # males reset whether they're accepted or not, same as in act
+        self.desire_mate[males] = 0
+        self.can_mate[males] = False
+        self.state[males] = 3
+
+        willing = (
+            (females.age[mates] >= females.settings['maturity']) & females.can_mate[mates]
+            & (females.state[mates] == 1)
+            )
+        mothers, first = np.unique(mates[willing], return_index=True)
+        fathers = males[willing][first]
+        females.desire_mate[mothers] = 0
+        females.can_mate[mothers] = False
+        females.state[mothers] = 3
+        if len(mothers) == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        litter_size = females.settings['litter-size']
+        mothers = np.repeat(mothers, litter_size)
+        fathers = np.repeat(fathers, litter_size)
+        genomes = np.stack([self.gametes(fathers), self.gametes(mothers, females)], axis=2)
+        offset = np.tile(np.arange(litter_size), len(mothers) // litter_size) + 1
+        return females.add(
+            genomes, females.pos[mothers] + offset[:, None], females.angle[mothers],
+            world=females.world[mothers]
+            )
+
+    def steer(self, dt, targets=None):
+        """
+        Vectorized version of look_at. Turns every creature toward its
+        target by its turn speed. Creatures without a target wander toward
+        a random point that changes every counter_max frames.
+
+        Args:
+        - dt (float): The time step for the update.
+        - targets (numpy.ndarray): Optional array of shape (count, 2) of
+          points to turn toward. Rows that are nan use the wander point.
+
+        Returns:
+        - None
+        """
+        n = self.count
+        counter = self.counter[:n]
+
+        # picks a new random point for creatures whose timer ticked
+        reset = np.flatnonzero(counter % self.counter_max[:n] == 0)
+        self.random_target[reset] = self.random_points(reset)
+        self.counter_max[reset] = self.random_integers('movement', 100, 750, reset)
+        counter += 1
+
+        target = self.random_target[:n]
+        if targets is not None:
+            # creatures born after the targets were found don't have one
+            if len(targets) < n:
+                targets = np.concatenate([targets, np.full((n - len(targets), 2), np.nan)])
+            has_target = ~np.isnan(targets[:, 0])
+            target = np.where(has_target[:, None], targets, target)
+
+        # sign of the cross product says which way to turn
+        vec_to_target = target - self.pos[:n]
+        normal = self.normal[:n]
+        cross = normal[:, 0]*vec_to_target[:, 1] - normal[:, 1]*vec_to_target[:, 0]
+        self.angle[:n] += np.sign(cross)*self.turn_speed[:n]*dt
+
+    def move(self, dt):
+        """
+        Moves every creature along its orientation by its speed and bounces
+        it off the walls. Creatures never end up off the board.
+
+        Args:
+        - dt (float): The time step for the update.
+
+        Returns:
+        - None
+        """
+        n = self.count
+        angle = self.angle[:n]
+        pos = self.pos[:n]
+        normal = self.normal[:n]
+
+        np.cos(angle, out=normal[:, 0])
+        np.sin(angle, out=normal[:, 1])
+        pos += normal*self.speed[:n, None]*dt
+
+        # bounces creatures off walls instead of letting them go out of
+        # bounds, and picks a new random point to wander toward
+        bounce_y = (pos[:, 1] <= 10) | (pos[:, 1] >= self.height - 10)
+        angle[bounce_y] = -angle[bounce_y]
+        bounce_x = (pos[:, 0] <= 10) | (pos[:, 0] >= self.width - 10)
+        angle[bounce_x] = np.pi - angle[bounce_x]
+        bounced = np.flatnonzero(bounce_x | bounce_y)
+        self.random_target[bounced] = self.random_points(bounced)
+        # a fast creature near a wall can still step past it before it turns
+        # around, so it's kept on the board
+        np.clip(pos[:, 0], 0, np.nextafter(self.width, 0), out=pos[:, 0])
+        np.clip(pos[:, 1], 0, np.nextafter(self.height, 0), out=pos[:, 1])
+
+    def grow_older(self):
+        """
+        Ages every creature and marks the ones past their max age as dead.
+
+        Args:
+        - None
+
+        Returns:
+        - None
+        """
+        n = self.count
+        self.age[:n] += 0.1
+        self.dead[:n] |= self.age[:n] >= self.max_age[:n]
+
+    def tick(self, dt, grid=None, targets=None, cell_size=25):
+        """
+        Steps every creature by one frame: metabolism, desire to mate, state,
+        grazing for prey, steering, movement, wall bounce and aging. Dead
+        creatures are removed at the end.
+
+        Args:
+        - dt (float): The time step for the update.
+        - grid (numpy.ndarray): The grid of grass. Prey only eat if given.
+        - targets (numpy.ndarray): Optional array of shape (count, 2) of
+          points to steer toward, see steer.
+        - cell_size (int): Size of each environment cell.
+
+        Returns:
+        - numpy.ndarray: uids of the creatures that died this frame.
+        """
+        self.update_state()
+        if grid is not None and self.ptype == 'prey':
+            self.graze(grid, cell_size)
+        self.steer(dt, targets)
+        self.move(dt)
+        self.grow_older()
+        return self.remove_dead()
+
+    def view(self, index):
+        """
+        Returns a Creature_View of creature index, for debugging.
+
+        Args:
+        - index (int): Index of the creature in the arrays.
+
+        Returns:
+        - Creature_View: View of the creature.
+        """
+        return Creature_View(self, self.uid[index])
+
+class Creature_View:
+    """
+    Looks like a single Herbivore or Carnivore object but reads everything
+    from a Population. Used for debugging and inspecting single creatures.
+    Follows the creature by its uid, so it stays valid when dead creatures
+    are removed and the arrays get shifted
+    """
+    __slots__ = ('population', 'uid')
+
+    def __init__(self, population, uid):
+        """
+        Initializes a view of one creature.
+
+        Args:
+        - population (Population): The population the creature belongs to.
+        - uid (int): The creature's uid.
+        """
+        self.population = population
+        self.uid = uid
+
+    @property
+    def index(self):
+        """
+        Index of the creature in the population arrays, None if it's gone.
+        """
+        found = np.flatnonzero(self.population.uid[:self.population.count] == self.uid)
+        if len(found) == 0:
+            return None
+        return found[0]
+
+    def alive_index(self):
+        """
+        Index of the creature in the population arrays.
+
+        Args:
+        - None
+
+        Returns:
+        - int: The index. Raises LookupError if the creature is gone.
+        """
+        index = self.index
+        if index is None:
+            raise LookupError('creature {} is dead'.format(self.uid))
+        return index
+
+    @property
+    def ptype(self):
+        return self.population.ptype
+
+    @property
+    def dead(self):
+        return self.index is None
+
+    @property
+    def genes(self):
+        return array_to_genes(self.population.genes[self.alive_index()])
+
+    def __getattr__(self, name):
+        # everything else is read straight from the population's arrays
+        if name not in self.population.fields:
+            raise AttributeError(name)
+        return getattr(self.population, name)[self.alive_index()]
+
+    def __repr__(self):
+        return '<Creature_View {} {}>'.format(self.ptype, self.uid)
@@ -0,0 +1,196 @@
+import csv
+import time
+
+# Measures where the time of every frame goes. Simulation.step and the
+# main loop call lap at the end of each phase, which adds the time since
+# the last lap to that phase, so timing costs one perf_counter call per
+# phase per frame. Every so many frames the average of each phase is
+# worked out, shown by draw and added as a row to a csv file, along with
+# how many creatures there were and how many candidates the hashing grid
+# handed back per query.
+
+# Phases of a frame, in the order they run
+phase_names = [
+    'statistics', 'grass-render', 'grass', 'hash-rebuild', 'update-state', 'sense',
+    'act', 'commit', 'reproduction', 'movement', 'deaths', 'draw', 'flip'
+    ]
+
+def no_lap(phase):
+    """
+    Stands in for Tick_Profiler.lap when nothing is being profiled.
+
+    Args:
+    - phase (str): Name of the phase that just ended.
+
+    Returns:
+    - None
+    """
+
+class Tick_Profiler:
+    """
+    Adds up the time spent in every phase of a frame and averages it over
+    windows of frames. A frame is one drawn frame, which can be several
+    simulation steps when fast forwarding
+    """
+    def __init__(self, location=None, every=100):
+        """
+        Initializes the profiler.
+
+        Args:
+        - location (str): Optional csv file a row is added to for every
+          window of frames. Overwritten.
+        - every (int): Number of frames averaged in each window.
+        """
+        self.location = location
+        self.every = every
+        self.frame = 0
+        self.last = time.perf_counter()
+        self.reset()
+        self.averages = None # from the last full window, see summarize
+
+        self.columns = (
+            ['frame', 'steps-per-frame', 'creatures', 'queries-per-frame', 'candidates-per-query']
+            + [name + '-ms' for name in phase_names] + ['total-ms']
+            )
+        if location is not None:
+            with open(location, 'w', newline='') as file:
+                csv.writer(file).writerow(self.columns)
+
+    def reset(self):
+        """
+        Starts a new window.
+
+        Args:
+        - None
+
+        Returns:
+        - None
+        """
+        self.totals = dict.fromkeys(phase_names, 0.0)
+        self.frames = 0
+        self.steps = 0
+        self.queries = 0
+        self.candidates = 0
+
+    def start(self):
+        """
+        Starts timing, the time since the last lap isn't counted.
+
+        Args:
+        - None
+
+        Returns:
+        - None
+        """
+        self.last = time.perf_counter()
+
+    def lap(self, phase):
+        """
+        Ends a phase, adding the time since the last lap or start to it.
+
+        Args:
+        - phase (str): Name of the phase, from phase_names.
+
+        Returns:
+        - None
+        """
+        now = time.perf_counter()
+        self.totals[phase] += now - self.last
+        self.last = now
+
+    def end_frame(self, simulation, steps=1):
+        """
+        Ends a frame. Collects the hashing grid's query counts and
+        summarizes the window if it's full.
+
+        Args:
+        - simulation (Simulation): The simulation being profiled.
+        - steps (int): Number of simulation steps in the frame.
+
+        Returns:
+        - None
+        """
+        grid = simulation.hashing_grid
+        self.queries += grid.num_queries
+        self.candidates += grid.num_candidates
+        grid.num_queries = 0
+        grid.num_candidates = 0
+        self.frames += 1
+        self.steps += steps
+        self.frame += 1
+        if self.frames >= self.every:
+            self.summarize(len(simulation.creature_group))
+
+    def summarize(self, creatures):
+        """
+        Averages the window, saves it to the csv file and starts a new one.
+
+        Args:
+        - creatures (int): Number of creatures alive now.
+
+        Returns:
+        - None
+        """
+        if self.frames == 0:
+            return
+        phases = {name: 1000*total/self.frames for name, total in self.totals.items()}
+        self.averages = {
+            'frame': self.frame,
+            'steps-per-frame': self.steps/self.frames,
+            'creatures': creatures,
+            'queries-per-frame': self.queries/self.frames,
+            'candidates-per-query': self.candidates/self.queries if self.queries else 0,
+            'phases': phases,
+            'total-ms': sum(phases.values()),
+            }
+        if self.location is not None:
+            row = [self.averages[column] for column in self.columns[:5]]
+            row += [phases[name] for name in phase_names] + [self.averages['total-ms']]
+            with open(self.location, 'a', newline='') as file:
+                csv.writer(file).writerow(row)
+        self.reset()
+
+    def draw(self, screen, font):
+        """
+        Draws the averages of the last window in the top left corner.
+
+        Args:
+        - screen (pygame.display): The screen to draw on.
+        - font (pygame.font.Font): Font of the text.
+
+        Returns:
+        - None
+        """
+        if self.averages is None:
+            lines = ['Profiling, {} frames to go'.format(self.every - self.frames)]
+        else:
+            averages = self.averages
+            total = averages['total-ms'] or 1
+            lines = [
+                '{} creatures, x{:.1f} steps, {:.0f} ms ({:.0f} fps)'.format(
+                    averages['creatures'], averages['steps-per-frame'], averages['total-ms'],
+                    1000/total),
+                '{:.0f} queries, {:.1f} candidates each'.format(
+                    averages['queries-per-frame'], averages['candidates-per-query']),
+                ]
+            for name in phase_names:
+                ms = averages['phases'][name]
+                lines.append('{:<14}{:7.2f} ms {:4.0f}%'.format(name, ms, 100*ms/total))
+
+        y = 10
+        for line in lines:
+            text = font.render(line, True, (255, 255, 255), (0, 0, 0))
+            screen.blit(text, (10, y))
+            y += text.get_height()
+
+    def close(self, simulation):
+        """
+        Saves the last window, even if it isn't full.
+
+        Args:
+        - simulation (Simulation): The simulation being profiled.
+
+        Returns:
+        - None
+        """
+        self.summarize(len(simulation.creature_group))
@@ -0,0 +1,242 @@
+import csv
+import os
+import queue
+import threading
+
+# Columns of the death records csv file, one row per creature that died:
+# its species ('prey' or 'predator'), its age and its expressed gene
+# values. The file has one header row and no index column. The old
+# prey-genes-data.csv was written by pandas with an index column and a
+# header before every batch, so records go to a file of their own instead
+# of being mixed into it
+death_columns = [
+    'ptype', 'age-at-death', 'speed', 'turn-speed', 'fov', 'view-dist', 'max-energy',
+    'metabolism-rate', 'find-mate-rate', 'max-desire-to-mate'
+    ]
+
+# Columns of the statistics csv file, one row per frame
+time_series_columns = [
+    'time', 'num-herbivores', 'num-carnivores', 'speed', 'turn-speed', 'fov', 'view-dist',
+    'max-energy', 'metabolism-rate', 'find-mate-rate', 'max-desire-to-mate'
+    ]
+
+class Death_Log:
+    """
+    Records the age and genes of every creature that dies. Records are
+    kept in memory and handed in batches to a background thread that
+    appends them to a csv file, so the simulation never waits on the disk.
+    The file gets a header when it's new or empty, and a file that already
+    has a different header isn't added to. close has to be called at the
+    end of the run to write whatever is left. If the writer thread fails,
+    the error is raised by the next flush or close
+    """
+    def __init__(self, location='death-records.csv', batch_size=256):
+        """
+        Opens the log and starts the writer thread.
+
+        Args:
+        - location (str): Where the csv file is saved. Records are added to
+          the end of it, like the earlier runs.
+        - batch_size (int): Number of records kept before they are written.
+        """
+        if os.path.exists(location) and os.path.getsize(location) > 0:
+            with open(location, newline='') as file:
+                header = next(csv.reader(file), [])
+            if header != death_columns:
+                raise ValueError('{} has other columns than the death records, pick another file'.format(location))
+        self.location = location
+        self.batch_size = batch_size
+        self.buffer = []
+        self.batches = queue.Queue()
+        self.error = None # exception the writer thread stopped with
+        self.closed = False
+
+        self.thread = threading.Thread(target=self.write_batches, daemon=True)
+        self.thread.start()
+
+    def record(self, creature):
+        """
+        Adds a creature that just died to the log.
+
+        Args:
+        - creature (Herbivore or Carnivore): The creature that died.
+
+        Returns:
+        - None
+        """
+        if self.closed:
+            raise ValueError('Death_Log for {} is closed'.format(self.location))
+        phenotype = creature.phenotype
+        self.buffer.append((
+            creature.ptype,
+            creature.age,
+            phenotype.speed,
+            phenotype.turn_speed,
+            phenotype.fov,
+            phenotype.view_dist,
+            phenotype.max_energy,
+            phenotype.metabolism_rate,
+            phenotype.find_mate_rate,
+            phenotype.max_desire_to_mate
+            ))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Hands the records kept so far to the writer thread.
+
+        Args:
+        - None
+
+        Returns:
+        - None
+        """
+        if self.error is not None:
+            raise self.error
+        if self.buffer:
+            self.batches.put(self.buffer)
+            self.buffer = []
+
+    def write_batches(self):
+        """
+        Runs on the writer thread. Writes the header if the file is new
+        and then every batch it's given until close sends None. Anything
+        that goes wrong is kept in error for the main thread to raise.
+
+        Args:
+        - None
+
+        Returns:
+        - None
+        """
+        try:
+            with open(self.location, 'a', newline='') as file:
+                writer = csv.writer(file)
+                if file.tell() == 0:
+                    writer.writerow(death_columns)
+                while True:
+                    batch = self.batches.get()
+                    if batch is None:
+                        break
+                    writer.writerows(batch)
+                    file.flush()
+        except Exception as error:
+            self.error = error
+
+    def close(self):
+        """
+        Writes the remaining records and waits for the writer thread to
+        finish. Nothing can be recorded after this. Raises the writer
+        thread's error if it failed.
+
+        Args:
+        - None
+
+        Returns:
+        - None
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if self.thread.is_alive():
+            self.batches.put(self.buffer)
+            self.buffer = []
+            self.batches.put(None)
+            self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+class Time_Series_Writer:
+    """
+    Streams the statistics recorded every frame to a csv file. Rows are
+    kept in memory until chunk_size of them have built up (or flush is
+    called) and then appended to the file, so saving never rewrites the
+    rows that were already saved. Rows aren't kept in memory after they're
+    written. The file has the same layout as the one pandas used to write,
+    with the row number in the first column
+    """
+    def __init__(self, location, columns=time_series_columns, chunk_size=1000):
+        """
+        Creates the csv file and writes the header.
+
+        Args:
+        - location (str): Where the csv file is saved. Overwritten every run.
+        - columns (list): Column names of the rows that will be added.
+        - chunk_size (int): Number of rows kept before they're written.
+        """
+        self.location = location
+        self.columns = columns
+        self.chunk_size = chunk_size
+        self.buffer = []
+        self.rows_written = 0
+
+        with open(self.location, 'w', newline='') as file:
+            csv.writer(file).writerow([''] + self.columns)
+
+    def __len__(self):
+        """
+        Number of rows added so far, written or not.
+        """
+        return self.rows_written + len(self.buffer)
+
+    def append(self, row):
+        """
+        Adds one row.
+
+        Args:
+        - row (list): Values in the order of columns.
+
+        Returns:
+        - None
+        """
+        self.buffer.append([len(self)] + list(row))
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Appends the rows that haven't been written yet to the file.
+
+        Args:
+        - None
+
+        Returns:
+        - None
+        """
+        if not self.buffer:
+            return
+        with open(self.location, 'a', newline='') as file:
+            csv.writer(file).writerows(self.buffer)
+        self.rows_written += len(self.buffer)
+        self.buffer = []
+
+    def restore(self, data, rows):
+        """
+        Replaces the file with rows saved from another run, see
+        checkpoint.py. Rows added after this continue from them.
+
+        Args:
+        - data (bytes): Contents of the other run's file, header included.
+        - rows (int): Number of rows in data.
+
+        Returns:
+        - None
+        """
+        with open(self.location, 'wb') as file:
+            file.write(data)
+        self.buffer = []
+        self.rows_written = rows
+
+    def close(self):
+        """
+        Writes the remaining rows. Same as flush, here so it can be used
+        like the Death_Log.
+
+        Args:
+        - None
+
+        Returns:
+        - None
+        """
+        self.flush()
@@ -0,0 +1,242 @@
+import numpy as np
+
+# Random numbers for the model. Instead of the global np.random functions
+# every kind of randomness has its own stream, a numpy Generator, so
+# changing how often one part of the model draws numbers doesn't change
+# what every other part gets:
+#
+# - setup: the starting creatures, see Simulation.populate
+# - movement: wander points and wander timers
+# - lifecycle: how long creatures live
+# - genetics: gametes and mutations, see genetics.form_gametes
+#
+# All of the streams are made from one seed by seed, which Simulation
+# calls when it's created, so the same seed always gives the same run.
+# Single numbers are handed out from a batch drawn ahead of time, since
+# asking a Generator for one number at a time is slow.
+#
+# Worlds that are stepped together but have to stay independent (see
+# ensemble.py) each get their own set of streams from World_Streams
+# instead of sharing these.
+
+stream_names = ('setup', 'movement', 'lifecycle', 'genetics')
+
+class Random_Stream:
+    """
+    One stream of random numbers. Single numbers come from a buffer of
+    uniform numbers in [0, 1) that's refilled batch_size at a time, arrays
+    are drawn straight from the Generator
+    """
+    def __init__(self, batch_size=4096):
+        """
+        Initializes the stream. It has to be seeded with reseed before use.
+
+        Args:
+        - batch_size (int): How many single numbers are drawn at once.
+        """
+        self.batch_size = batch_size
+        self.generator = None
+        self.buffer = []
+        self.position = 0
+
+    def reseed(self, seed_sequence):
+        """
+        Starts the stream over from a seed.
+
+        Args:
+        - seed_sequence (numpy.random.SeedSequence): Seed of the stream.
+
+        Returns:
+        - None
+        """
+        self.generator = np.random.default_rng(seed_sequence)
+        self.buffer = []
+        self.position = 0
+
+    def random(self):
+        """
+        A uniform number in [0, 1) from the buffer.
+
+        Args:
+        - None
+
+        Returns:
+        - float: The number.
+        """
+        if self.position == len(self.buffer):
+            # python floats, since indexing a list is faster than a numpy array
+            self.buffer = self.generator.random(self.batch_size).tolist()
+            self.position = 0
+        value = self.buffer[self.position]
+        self.position += 1
+        return value
+
+    def integers(self, low, high, size=None):
+        """
+        Whole numbers from low up to but not including high, like
+        np.random.randint.
+
+        Args:
+        - low (int): Lowest number.
+        - high (int): One past the highest number.
+        - size (int or tuple): Shape of the array to draw. None draws a
+          single number.
+
+        Returns:
+        - int or numpy.ndarray: The numbers.
+        """
+        if size is None:
+            return low + int(self.random()*(high - low))
+        return self.generator.integers(low, high, size=size)
+
+    def uniform(self, low=0.0, high=1.0, size=None):
+        """
+        Uniform numbers between low and high, like np.random.uniform.
+
+        Args:
+        - low (float): Lowest number.
+        - high (float): Highest number.
+        - size (int or tuple): Shape of the array to draw. None draws a
+          single number.
+
+        Returns:
+        - float or numpy.ndarray: The numbers.
+        """
+        if size is None:
+            return low + self.random()*(high - low)
+        return self.generator.uniform(low, high, size=size)
+
+    def get_state(self):
+        """
+        State of the stream, for checkpoints (see checkpoint.py).
+
+        Args:
+        - None
+
+        Returns:
+        - dict: The Generator's state and the numbers left in the buffer.
+        """
+        return {
+            'generator': self.generator.bit_generator.state,
+            'buffer': self.buffer[self.position:],
+            }
+
+    def set_state(self, state):
+        """
+        Puts the stream back in a state from get_state.
+
+        Args:
+        - state (dict): The state.
+
+        Returns:
+        - None
+        """
+        self.generator = np.random.default_rng()
+        self.generator.bit_generator.state = state['generator']
+        self.buffer = list(state['buffer'])
+        self.position = 0
+
+class World_Streams:
+    """
+    A separate set of streams for every world in a batch, each made from
+    that world's seed alone. A world only ever draws from its own
+    streams, so what happens in it doesn't depend on the other worlds it's
+    stepped with
+    """
+    def __init__(self, seeds):
+        """
+        Makes the streams of every world.
+
+        Args:
+        - seeds (list): Seed of each world.
+        """
+        self.worlds = []
+        for value in seeds:
+            children = np.random.SeedSequence(value).spawn(len(stream_names))
+            streams = {}
+            for name, child in zip(stream_names, children):
+                streams[name] = Random_Stream()
+                streams[name].reseed(child)
+            self.worlds.append(streams)
+
+    def stream(self, world, name):
+        """
+        One stream of one world.
+
+        Args:
+        - world (int): The world.
+        - name (str): Name of the stream, from stream_names.
+
+        Returns:
+        - Random_Stream: The stream.
+        """
+        return self.worlds[world][name]
+
+    def integers(self, name, low, high, worlds):
+        """
+        One whole number from low up to but not including high for every
+        entry of worlds, each drawn from that world's stream. Every world's
+        numbers are drawn in one go, in the order they come in worlds.
+
+        Args:
+        - name (str): Name of the stream, from stream_names.
+        - low (int): Lowest number.
+        - high (int): One past the highest number.
+        - worlds (numpy.ndarray): World of every number.
+
+        Returns:
+        - numpy.ndarray: The numbers.
+        """
+        values = np.empty(len(worlds), dtype=np.int64)
+        for world in np.unique(worlds).tolist():
+            here = np.flatnonzero(worlds == world)
+            values[here] = self.worlds[world][name].integers(low, high, size=len(here))
+        return values
+
+setup = Random_Stream()
+movement = Random_Stream()
+lifecycle = Random_Stream()
+genetics = Random_Stream()
+streams = {'setup': setup, 'movement': movement, 'lifecycle': lifecycle, 'genetics': genetics}
+
+def seed(value=None):
+    """
+    Seeds every stream. Each gets its own independent seed made from value.
+
+    Args:
+    - value (int or tuple): The seed, or a tuple of numbers like
+      (seed, frame, tile). None picks a new random seed.
+
+    Returns:
+    - None
+    """
+    children = np.random.SeedSequence(value).spawn(len(stream_names))
+    for name, child in zip(stream_names, children):
+        streams[name].reseed(child)
+
+def get_state():
+    """
+    State of every stream.
+
+    Args:
+    - None
+
+    Returns:
+    - dict: State of each stream keyed by name.
+    """
+    return {name: stream.get_state() for name, stream in streams.items()}
+
+def set_state(state):
+    """
+    Puts every stream back in a state from get_state.
+
+    Args:
+    - state (dict): State of each stream keyed by name.
+
+    Returns:
+    - None
+    """
+    for name, stream_state in state.items():
+        streams[name].set_state(stream_state)
+
+seed()
@@ -0,0 +1,164 @@
+import numpy as np
+
+# Finding what creatures can see, for many creatures at once. A search is
+# given as pairs of (seeker, candidate) indices, so every distance and
+# field of view check is done in one pass over numpy arrays instead of a
+# python loop per creature. A candidate can be seen if it's within the
+# seeker's view distance and inside its field of view cone, which is fov/2
+# to either side of the direction it's facing
+
+def expand_ranges(starts, lengths):
+    """
+    Concatenates the ranges start, start + 1, ..., start + length - 1 for
+    every start and length without a python loop.
+
+    Args:
+    - starts (numpy.ndarray): First value of every range.
+    - lengths (numpy.ndarray): Length of every range.
+
+    Returns:
+    - numpy.ndarray: The values of all the ranges, one after another.
+    """
+    total = lengths.sum()
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    # where each range begins in the output, subtracted from the position
+    # in the output to get the offset into the range
+    begins = np.cumsum(lengths) - lengths
+    return np.repeat(starts - begins, lengths) + np.arange(total)
+
+def nearest_targets(seeker_pos, seeker_normal, half_fov, view_dist, target_pos, seekers, candidates):
+    """
+    Finds the nearest candidate every seeker can see.
+
+    Args:
+    - seeker_pos (numpy.ndarray): (n, 2) positions of the seekers.
+    - seeker_normal (numpy.ndarray): (n, 2) unit vectors the seekers face.
+    - half_fov (numpy.ndarray): Half of each seeker's field of view, in radians.
+    - view_dist (numpy.ndarray): View distance of each seeker.
+    - target_pos (numpy.ndarray): (m, 2) positions of the targets.
+    - seekers (numpy.ndarray): Seeker index of every pair.
+    - candidates (numpy.ndarray): Target index of every pair.
+
+    Returns:
+    - numpy.ndarray: Index of the nearest visible target of every seeker,
+      -1 for seekers that can't see any. Ties go to the pair that comes
+      first.
+    """
+    nearest = np.full(len(seeker_pos), -1, dtype=np.int64)
+    if len(seekers) == 0:
+        return nearest
+
+    vec_to_target = target_pos[candidates] - seeker_pos[seekers]
+    dist = np.hypot(vec_to_target[:, 0], vec_to_target[:, 1])
+    normal = seeker_normal[seekers]
+    dot = vec_to_target[:, 0]*normal[:, 0] + vec_to_target[:, 1]*normal[:, 1]
+
+    # inside the cone if the angle to the target is at most half the fov,
+    # written without dividing by dist so targets on top of the seeker
+    # count. A negative fov is treated like 0
+    visible = (dist <= view_dist[seekers]) & (dot >= np.cos(np.clip(half_fov[seekers], 0, np.pi))*dist)
+    seekers = seekers[visible]
+    candidates = candidates[visible]
+    dist = dist[visible]
+
+    # sorts by seeker, then distance, and keeps the first pair of each seeker
+    order = np.lexsort((dist, seekers))
+    first = np.flatnonzero(np.diff(seekers[order], prepend=-1) != 0)
+    nearest[seekers[order[first]]] = candidates[order[first]]
+    return nearest
+
+def candidate_pairs(seeker_pos, radius, target_pos, cell_size, shape, seeker_world=None, target_world=None):
+    """
+    Pairs every seeker with the targets in the grid cells within radius of
+    it. The targets are sorted by cell, so each row of cells a seeker looks
+    through is one contiguous range of them, and the ranges are expanded
+    into pairs all at once. Creatures of many separate worlds (see
+    ensemble.py) can share one grid by giving the world of each, the
+    world is then the first part of the cell key and seekers are only
+    paired with targets of their own world.
+
+    Args:
+    - seeker_pos (numpy.ndarray): (n, 2) positions of the seekers.
+    - radius (numpy.ndarray): Search distance of each seeker.
+    - target_pos (numpy.ndarray): (m, 2) positions of the targets.
+    - cell_size (int): Size of each grid cell.
+    - shape (tuple): (rows, columns) of the grid of one world.
+    - seeker_world (numpy.ndarray): Optional world of each seeker.
+    - target_world (numpy.ndarray): Optional world of each target, has to
+      be given with seeker_world.
+
+    Returns:
+    - tuple: (seekers, candidates) index arrays of the pairs.
+    """
+    num_rows, num_columns = shape
+    empty = np.zeros(0, dtype=np.int64)
+    if len(seeker_pos) == 0 or len(target_pos) == 0:
+        return empty, empty
+    if seeker_world is None:
+        num_worlds = 1
+        seeker_world = np.zeros(len(seeker_pos), dtype=np.int64)
+        target_world = np.zeros(len(target_pos), dtype=np.int64)
+    else:
+        num_worlds = int(max(seeker_world.max(), target_world.max())) + 1
+    num_cells = num_worlds*num_rows*num_columns
+
+    # sorts the targets by world and cell
+    target_column = np.clip((target_pos[:, 0]/cell_size).astype(np.int64), 0, num_columns - 1)
+    target_row = np.clip((target_pos[:, 1]/cell_size).astype(np.int64), 0, num_rows - 1)
+    keys = (target_world.astype(np.int64)*num_rows + target_row)*num_columns + target_column
+    order = np.argsort(keys, kind='stable')
+    cell_start = np.zeros(num_cells + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=num_cells), out=cell_start[1:])
+
+    column = np.clip((seeker_pos[:, 0]/cell_size).astype(np.int64), 0, num_columns - 1)
+    row = np.clip((seeker_pos[:, 1]/cell_size).astype(np.int64), 0, num_rows - 1)
+    cells = np.ceil(radius/cell_size).astype(np.int64)
+
+    # one run per seeker per row of cells it looks through, rows off the
+    # board are dropped so runs never reach into the next world
+    rows_searched = 2*cells + 1
+    run_seeker = np.repeat(np.arange(len(seeker_pos)), rows_searched)
+    run_row = expand_ranges(row - cells, rows_searched)
+    on_board = (run_row >= 0) & (run_row < num_rows)
+    run_seeker = run_seeker[on_board]
+    run_row = run_row[on_board] + seeker_world.astype(np.int64)[run_seeker]*num_rows
+
+    start = np.maximum(column - cells, 0)[run_seeker]
+    end = np.minimum(column + cells + 1, num_columns)[run_seeker]
+    first = cell_start[run_row*num_columns + start]
+    lengths = cell_start[run_row*num_columns + end] - first
+
+    seekers = np.repeat(run_seeker, lengths)
+    candidates = order[expand_ranges(first, lengths)]
+    return seekers, candidates
+
+def nearest_creatures(seekers, candidate_lists):
+    """
+    Finds the nearest creature every seeker can see out of its own list of
+    candidates, all in one pass. Used by Simulation.sense, which passes in
+    the candidates every Herbivore and Carnivore found in the hashing grid.
+
+    Args:
+    - seekers (list): Creatures that are searching.
+    - candidate_lists (list): A list of candidate creatures for every seeker.
+
+    Returns:
+    - list: The nearest visible candidate of every seeker, or None.
+    """
+    lengths = np.array([len(candidates) for candidates in candidate_lists], dtype=np.int64)
+    if lengths.sum() == 0:
+        return [None] * len(seekers)
+    targets = [creature for candidates in candidate_lists for creature in candidates]
+
+    seeker_pos = np.array([seeker.pos for seeker in seekers])
+    seeker_normal = np.array([seeker.normal for seeker in seekers])
+    half_fov = np.array([seeker.phenotype.fov/2 for seeker in seekers])
+    view_dist = np.array([seeker.phenotype.view_dist for seeker in seekers])
+    target_pos = np.array([creature.pos for creature in targets])
+
+    nearest = nearest_targets(
+        seeker_pos, seeker_normal, half_fov, view_dist, target_pos,
+        np.repeat(np.arange(len(seekers)), lengths), np.arange(len(targets))
+        )
+    return [targets[i] if i >= 0 else None for i in nearest.tolist()]
@@ -0,0 +1,508 @@
+import numpy as np
+import rng
+
+from assets import preload
+from carnivore import Carnivore
+from environment import *
+from genetics import array_to_genes, form_gametes
+from profiler import no_lap
+from herbivore import Herbivore
+from records import Death_Log, Time_Series_Writer
+from sensing import nearest_creatures
+from stats import Creature_Group
+
+# Constants of the model that experiments change, see sweep.py. Simulation
+# copies them onto the Herbivore and Carnivore classes
+default_settings = {
+    'prey-maturity': 50,
+    'predator-maturity': 200,
+    'grass-energy-divisor': 5, # prey energy gained is the grass eaten divided by this
+    'prey-hunger-threshold': 0.28, # prey get hungry below this fraction of max energy
+    'hunt-threshold': 0.5, # predators hunt below this fraction of max energy
+    'num-prey': 80,
+    'num-predators': 80,
+    }
+
+# Ranges the genes of the starting creatures are picked from. Both copies
+# of each gene are picked uniformly between low and high. Colors are whole
+# numbers from low up to but not including high
+initial_gene_ranges = {
+    'prey': {
+        'speed': (50, 150),
+        'turn-speed': (0, 2*np.pi),
+        'fov': (0, 2*np.pi),
+        'view-dist': (60, 250),
+        'max-energy': (75, 250),
+        'metabolism-rate': (0.01, 0.5),
+        'find-mate-rate': (0.1, 5),
+        'max-desire-to-mate': (40, 75),
+        'red': (0, 256),
+        'green': (0, 256),
+        'blue': (0, 256),
+        },
+    'predator': {
+        'speed': (80, 200),
+        'turn-speed': (np.pi/2, 2*np.pi),
+        'fov': (0, 2*np.pi),
+        'view-dist': (60, 250),
+        'max-energy': (75, 250),
+        'metabolism-rate': (0.01, 0.5),
+        'find-mate-rate': (5, 10),
+        'max-desire-to-mate': (40, 75),
+        'red': (0, 256),
+        'green': (0, 256),
+        'blue': (0, 256),
+        },
+    }
+
+color_genes = ('red', 'green', 'blue')
+
+class Simulation:
+    """
+    Holds the state of one run of the model: the grass grid, the hashing
+    grid, every creature and the statistics recorded each frame. main.py
+    uses it for both the pygame window and headless batch runs
+    """
+    def __init__(self, width=1300, height=600, cell_size=25, headless=False,
+                 location='tests/testopen/data.csv', death_location='death-records.csv',
+                 cone_sensing=False, settings=None, gene_ranges=None, seed=None, populate=True):
+        """
+        Initializes the environment and the starting population.
+
+        Args:
+        - width (int): Width of the board in pixels.
+        - height (int): Height of the board in pixels.
+        - cell_size (int): Size of each environment cell.
+        - headless (bool): If True nothing is ever drawn, so no pictures are
+          loaded and the creatures skip rotating their images.
+        - location (str): Where the statistics csv file is saved.
+        - death_location (str): Where the age and genes of every creature
+          that dies are saved.
+        - cone_sensing (bool): If True creatures skip hashing grid cells that
+          are outside their field of view.
+        - settings (dict): Values to change from default_settings.
+        - gene_ranges (dict): Ranges to change from initial_gene_ranges,
+          keyed by species and then gene.
+        - seed (int): Seed of every random number in the run, see rng.py.
+          None picks a new random seed.
+        - populate (bool): If False no starting creatures are added. Used
+          when the creatures come from a checkpoint, see checkpoint.py.
+        """
+        rng.seed(seed)
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.headless = headless
+        self.location = location
+        self.settings = dict(default_settings, **(settings or {}))
+        self.gene_ranges = {
+            ptype: dict(ranges, **(gene_ranges or {}).get(ptype, {}))
+            for ptype, ranges in initial_gene_ranges.items()
+            }
+
+        Herbivore.headless = headless
+        Carnivore.headless = headless
+        Herbivore.cone_sensing = cone_sensing
+        Carnivore.cone_sensing = cone_sensing
+        Herbivore.cell_size = cell_size
+        Herbivore.maturity = self.settings['prey-maturity']
+        Herbivore.hunger_threshold = self.settings['prey-hunger-threshold']
+        Herbivore.grass_energy_divisor = self.settings['grass-energy-divisor']
+        Carnivore.maturity = self.settings['predator-maturity']
+        Carnivore.hunt_threshold = self.settings['hunt-threshold']
+
+        # written to on a background thread, see records.py
+        self.death_log = Death_Log(death_location)
+        Herbivore.death_log = self.death_log
+        Carnivore.death_log = self.death_log
+        if not headless:
+            # loads the pictures now so births never read from disk
+            preload([
+                (Herbivore.picture_file, Herbivore.picture_size),
+                (Carnivore.picture_file, Carnivore.picture_size)
+                ])
+
+        # Set up for environment
+        num_cells_x = int(width/cell_size)
+        num_cells_y = int(height/cell_size)
+
+        # env_grid is the numpy array that holds the grass values,
+        # env_renderer draws the grass cells to the screen. Hashing grid is used
+        # to store the creatures positions to avoid looping through every organism
+        # each frame
+        self.env_grid, self.env_renderer, self.hashing_grid = create_environment(
+            num_cells_x, num_cells_y, cell_size, headless
+            )
+
+        # keeps counts and gene sums up to date as creatures are born and die
+        self.creature_group = Creature_Group()
+        if populate:
+            self.populate()
+
+        # Statistics recorded every frame. Written to location in chunks of
+        # 1000 rows, so at most that many are kept in memory
+        self.t = 0
+        self.herb_count = 0
+        self.carn_count = 0
+        self.births = {'prey': 0, 'predator': 0} # children born so far
+        self.time_series = Time_Series_Writer(location)
+        self.shown = True # False for frames that won't be drawn, see fast_forward
+        self.profiler = None # Tick_Profiler timing every phase of step, see profiler.py
+
+    def populate(self):
+        """
+        Adds the starting herbivores and carnivores with randomized genes.
+
+        Args:
+        - None
+
+        Returns:
+        - None
+        """
+        for i in range(self.settings['num-prey']):
+            creature = Herbivore(
+                self.random_genes('prey', i),
+                rng.setup.integers(10, 1290), rng.setup.integers(10, 590),
+                -rng.setup.uniform(0, 2*np.pi),
+                self.hashing_grid
+                )
+            creature.age = rng.setup.integers(0, 200)
+            self.creature_group.add(creature)
+
+        for i in range(self.settings['num-predators']):
+            creature = Carnivore(
+                self.random_genes('predator', i),
+                rng.setup.integers(10, 1290), rng.setup.integers(10, 590),
+                -rng.setup.uniform(0, 2*np.pi),
+                self.hashing_grid
+                )
+            creature.age = rng.setup.integers(0, 400)
+            self.creature_group.add(creature)
+
+    def random_genes(self, ptype, i):
+        """
+        Randomized genes for a starting creature, picked from the gene
+        ranges of its species.
+
+        Args:
+        - ptype (str): 'prey' or 'predator'.
+        - i (int): Number of the creature, every other one is male.
+
+        Returns:
+        - dict: Dictionary with both copies of every gene.
+        """
+        genes = {}
+        for name, (low, high) in self.gene_ranges[ptype].items():
+            if name in color_genes:
+                genes[name] = [rng.setup.integers(low, high), rng.setup.integers(low, high)]
+            else:
+                genes[name] = [rng.setup.uniform(low, high), rng.setup.uniform(low, high)]
+        genes['sex'] = [i % 2, 0] # male = [0, 1] or [1, 0], female = [0, 0]
+        return genes
+
+    def record_statistics(self):
+        """
+        Adds the number of creatures of each species and the average
+        herbivore genes to the statistics time series. Both come from the
+        creature group's Stats_Accumulator, so this doesn't loop through
+        the creatures.
+
+        Args:
+        - None
+
+        Returns:
+        - None
+        """
+        stats = self.creature_group.stats
+        self.herb_count = stats.counts['prey']
+        self.carn_count = stats.counts['predator']
+
+        averages = stats.averages('prey')
+        self.time_series.append([
+            self.t,
+            self.herb_count,
+            self.carn_count,
+            averages['speed'],
+            averages['turn-speed'],
+            averages['fov'],
+            averages['view-dist'],
+            averages['max-energy'],
+            averages['metabolism-rate'],
+            averages['find-mate-rate'],
+            averages['max-desire-to-mate']
+            ])
+
+    def extinct(self):
+        """
+        Checks if either species died out as of the last recorded frame.
+
+        Args:
+        - None
+
+        Returns:
+        - bool: True if there are no herbivores or no carnivores left.
+        """
+        return self.herb_count == 0 or self.carn_count == 0
+
+    def step(self, dt):
+        """
+        Advances the model by one frame: records statistics, grows the grass
+        and updates every creature. Doesn't draw anything. With a profiler
+        every phase is timed.
+
+        Args:
+        - dt (float): Time step for the update.
+
+        Returns:
+        - None
+        """
+        lap = no_lap
+        if self.profiler is not None:
+            self.profiler.start()
+            lap = self.profiler.lap
+
+        self.record_statistics()
+        lap('statistics')
+
+        if self.env_renderer is not None and self.shown:
+            self.env_renderer.update(self.env_grid) # recolors the grass surface from the grid
+        lap('grass-render')
+        self.env_grid = advance_grid(self.env_grid, dt, out=self.env_grid) # advances the grass grid by the growth rules, in place
+        lap('grass')
+
+        self.hashing_grid.rebuild() # re-sorts the creatures by cell if any of them moved cells
+        lap('hash-rebuild')
+
+        # The creatures are updated in phases. First every creature updates
+        # its state, then the targets of every creature that's searching
+        # are found in one batch (sense), and every creature decides what
+        # to do (act) from the frame as it was at the start, without
+        # changing anything but itself, so the order doesn't matter. commit
+        # then carries the decisions out one creature at a time in uid
+        # order, so conflicts always turn out the same way, and the
+        # offspring are made. Finally every creature moves and ages, and
+        # the ones that died are removed
+        creatures = self.creature_group.in_order()
+        for creature in creatures:
+            creature.update_state(self.hashing_grid)
+        lap('update-state')
+        self.sense(creatures)
+        lap('sense')
+        for creature in creatures:
+            creature.act(dt, self.hashing_grid)
+        lap('act')
+        pairs = self.commit(creatures)
+        lap('commit')
+        self.reproduce(pairs)
+        lap('reproduction')
+        for creature in creatures:
+            creature.advance(self.hashing_grid, dt)
+        lap('movement')
+        for creature in creatures:
+            if creature.dead:
+                creature.die(self.hashing_grid)
+        lap('deaths')
+
+        self.t += 0.001 # counter for plots
+
+    def sense(self, creatures):
+        """
+        Finds the target of every creature that's hunting or looking for a
+        mate. Each one looks up its own candidates in the hashing grid (see
+        Herbivore.search), and then the nearest one every creature can see
+        is found for all of them in one pass (see
+        sensing.nearest_creatures).
+
+        Args:
+        - creatures (list): Every creature, after update_state.
+
+        Returns:
+        - None
+        """
+        seekers = []
+        candidate_lists = []
+        for creature in creatures:
+            candidates = creature.search(self.hashing_grid)
+            if candidates is not None:
+                seekers.append(creature)
+                candidate_lists.append(candidates)
+        for creature, target in zip(seekers, nearest_creatures(seekers, candidate_lists)):
+            creature.target = target
+
+    def commit(self, creatures):
+        """
+        Carries out what every creature decided to do in act.
+        Creatures go in uid order and the first one to ask for something
+        gets it: the first prey in a cell eats all of its grass and the
+        ones after get nothing, a prey can only be eaten by the first
+        predator that caught it, and a female only accepts the first mate
+        (after that she can't mate until her rest period is over).
+        Every accepted pair is collected so their offspring can be made
+        all at once by reproduce.
+
+        Args:
+        - creatures (list): Every creature that acted, in uid order.
+
+        Returns:
+        - list: (father, mother) of every pair that mated, in uid order.
+        """
+        pairs = []
+        for creature in creatures:
+            intent = creature.intent
+            if intent is None:
+                continue
+
+            if intent[0] == 'graze':
+                _, row, column = intent
+                creature.eat_grass(self.env_grid[row, column])
+                self.env_grid[row, column] = 0
+
+            elif intent[0] == 'eat':
+                prey = intent[1]
+                if not prey.dead: # already eaten or starved this frame
+                    creature.eat_prey(prey)
+
+            elif intent[0] == 'mate':
+                if intent[1].accept_mate():
+                    pairs.append((creature, intent[1]))
+        return pairs
+
+    def reproduce(self, pairs):
+        """
+        Makes the offspring of every pair that mated this frame. The genomes
+        of all of the children are made in one pass over an array of the
+        parents' genomes (see genetics.form_gametes), then the children are
+        added to the group together, in the order of the pairs. They only
+        start moving next frame.
+
+        Args:
+        - pairs (list): (father, mother) of every pair, in uid order.
+
+        Returns:
+        - None
+        """
+        if not pairs:
+            return
+        # one row per child, a litter of children for each pair
+        fathers = [father for father, mother in pairs for i in range(mother.litter_size)]
+        mothers = [mother for father, mother in pairs for i in range(mother.litter_size)]
+        genomes = np.stack([
+            form_gametes(np.array([father.genome for father in fathers])),
+            form_gametes(np.array([mother.genome for mother in mothers]))
+            ], axis=2) # first copy from the father, second from the mother
+
+        children = []
+        for father, mother in pairs:
+            for i in range(mother.litter_size):
+                genes = array_to_genes(genomes[len(children)])
+                children.append(type(mother)(
+                    genes, mother.pos[0]+1+i, mother.pos[1]+1+i, mother.angle, self.hashing_grid
+                    ))
+            self.births[mother.ptype] += mother.litter_size
+        self.creature_group.add(*children)
+
+    def fast_forward(self, dt, steps):
+        """
+        Steps several frames for one frame that's drawn. Only the last one
+        updates the grass surface and the creature pictures, since the
+        others are never seen. Stops early if either species dies out.
+
+        Args:
+        - dt (float): Time step for every frame.
+        - steps (int): Number of frames to step.
+
+        Returns:
+        - int: Number of frames that were stepped.
+        """
+        stepped = 0
+        for i in range(steps):
+            self.set_shown(i == steps - 1)
+            self.step(dt)
+            stepped += 1
+            if self.extinct():
+                break
+        self.set_shown(True)
+        return stepped
+
+    def set_shown(self, shown):
+        """
+        Sets whether the next frame will be drawn.
+
+        Args:
+        - shown (bool): False if it won't be drawn.
+
+        Returns:
+        - None
+        """
+        self.shown = shown
+        Herbivore.shown = shown
+        Carnivore.shown = shown
+
+    def draw(self, screen):
+        """
+        Draws the grass and every creature to the screen.
+
+        Args:
+        - screen (pygame.display): The screen to draw on.
+
+        Returns:
+        - None
+        """
+        self.env_renderer.draw(screen) # draws the grass surface
+        self.creature_group.draw(screen) # calls draw function for every organism
+
+    def run(self, dt, max_ticks=None):
+        """
+        Steps the model without drawing until either species goes extinct
+        or max_ticks frames have run, then writes the statistics and death
+        records so far. The run can be carried on with step or run again,
+        close has to be called once it's over.
+
+        Args:
+        - dt (float): Time step for every frame.
+        - max_ticks (int): Maximum number of frames to run. None runs until
+          extinction.
+
+        Returns:
+        - int: Number of frames that were run.
+        """
+        ticks = 0
+        while max_ticks is None or ticks < max_ticks:
+            self.step(dt)
+            ticks += 1
+            if self.profiler is not None:
+                self.profiler.end_frame(self)
+            if self.extinct():
+                break
+        self.save_data()
+        self.death_log.flush()
+        return ticks
+
+    def save_data(self):
+        """
+        Saves herbivore count and population statistics to csv file. Only
+        the rows recorded since the last save are written.
+
+        Args:
+        - None
+
+        Returns:
+        - None
+        """
+        self.time_series.flush()
+
+    def close(self):
+        """
+        Finishes writing the statistics and death records. Call once the run
+        is over.
+
+        Args:
+        - None
+
+        Returns:
+        - None
+        """
+        self.time_series.close()
+        self.death_log.close()
+        if self.profiler is not None:
+            self.profiler.close(self)
@@ -0,0 +1,389 @@
+import numpy as np
+
+from functools import lru_cache
+
+# Stencils are the sets of hashing grid cells a creature looks through,
+# stored as runs: for every run, dy is the row offset from the creature's
+# cell and dx_start to dx_end (inclusive) are the column offsets. Runs are in
+# row order with the columns going left to right, same order the cells used
+# to be checked in. They only depend on a few numbers, so they're made once
+# and cached instead of being rebuilt by every creature every frame
+
+# Number of directions and field of view widths cone stencils are made for
+direction_buckets = 32
+fov_buckets = 16
+
+# The hashing grid keeps a separate list of creatures for every species and
+# sex, so searches for prey or for mates only look at creatures they want
+species = ('prey', 'predator')
+num_buckets = 2*len(species)
+
+def bucket_of(ptype, sex):
+    """
+    Bucket of the hashing grid creatures of a species and sex are kept in.
+
+    Args:
+    - ptype (str): 'prey' or 'predator'.
+    - sex (int): 1 = male, 0 = female.
+
+    Returns:
+    - int: The bucket.
+    """
+    return 2*species.index(ptype) + sex
+
+def buckets_of(ptype, sex=None):
+    """
+    Buckets to search to find creatures of a species, and optionally of
+    one sex.
+
+    Args:
+    - ptype (str): 'prey' or 'predator'.
+    - sex (int): 1 = male, 0 = female. Both if None.
+
+    Returns:
+    - tuple: The buckets.
+    """
+    if sex is None:
+        return (bucket_of(ptype, 0), bucket_of(ptype, 1))
+    return (bucket_of(ptype, sex),)
+
+@lru_cache(maxsize=None)
+def square_stencil(radius):
+    """
+    Stencil of every cell within radius cells of the creature's cell,
+    (2*radius + 1)^2 cells in total.
+
+    Args:
+    - radius (int): Number of cells to look in every direction.
+
+    Returns:
+    - tuple: (dy, dx_start, dx_end) tuples of the runs.
+    """
+    return tuple((dy, -radius, radius) for dy in range(-radius, radius + 1))
+
+@lru_cache(maxsize=None)
+def cone_stencil(radius, direction, fov_width):
+    """
+    Stencil of the cells in radius that could be inside a creature's field
+    of view. A cell is kept if any point in it could be in the cone from
+    any point in the creature's own cell, so no creature that can be seen
+    is ever skipped. Cells that are entirely behind the creature are left
+    out.
+
+    Args:
+    - radius (int): Number of cells to look in every direction.
+    - direction (int): Bucket of the creature's orientation, from cone_buckets.
+    - fov_width (int): Bucket of the creature's field of view, from cone_buckets.
+
+    Returns:
+    - tuple: (dy, dx_start, dx_end) tuples of the runs.
+    """
+    if fov_width >= fov_buckets:
+        return square_stencil(radius)
+
+    # widest angles the bucket could stand for
+    angle = direction * 2*np.pi / direction_buckets
+    half_fov = (fov_width + 1) * np.pi / fov_buckets + np.pi / direction_buckets
+
+    offsets = np.arange(-radius, radius + 1)
+    dx, dy = np.meshgrid(offsets, offsets)
+    dist = np.hypot(dx, dy)
+
+    # points in the cell seen from anywhere in the creature's cell are
+    # within sqrt(2) cells of the offset between the two cells
+    margin = np.sqrt(2)
+    near = dist <= margin
+    widen = np.arcsin(np.minimum(1, margin / np.maximum(dist, margin)))
+    off_angle = np.abs((np.arctan2(dy, dx) - angle + np.pi) % (2*np.pi) - np.pi)
+    keep = near | (off_angle <= half_fov + widen)
+    keep &= dist - margin <= radius
+
+    runs = []
+    for row in range(len(offsets)):
+        columns = np.flatnonzero(keep[row])
+        if len(columns) == 0:
+            continue
+        # splits the row wherever there's a gap in the kept cells
+        breaks = np.flatnonzero(np.diff(columns) > 1)
+        starts = np.concatenate(([columns[0]], columns[breaks + 1]))
+        ends = np.concatenate((columns[breaks], [columns[-1]]))
+        for start, end in zip(starts, ends):
+            runs.append((int(offsets[row]), int(offsets[start]), int(offsets[end])))
+    return tuple(runs)
+
+def cone_buckets(angle, fov):
+    """
+    Rounds an orientation and field of view to the buckets cone stencils
+    are made for. The field of view is rounded down since cone_stencil
+    widens it by a bucket.
+
+    Args:
+    - angle (float): Orientation of the creature in radians.
+    - fov (float): Full field of view of the creature in radians.
+
+    Returns:
+    - tuple: (direction, fov_width) buckets.
+    """
+    direction = int(round(angle / (2*np.pi) * direction_buckets)) % direction_buckets
+    fov_width = min(fov_buckets, max(0, int(fov / (2*np.pi) * fov_buckets)))
+    return direction, fov_width
+
+class Spatial_Hash:
+    """
+    Spatial hashing grid that stores which creatures are in which cell, at
+    several cell sizes. Level 0 uses cell_size, and every level after that
+    uses cells twice as wide, so one level k cell covers 2^k by 2^k level 0
+    cells. Every creature gets a slot with the integer key of its level 0
+    cell (row*num_cells_x + column) and the bucket of its species and sex.
+    Once per frame, rebuild sorts the slots by bucket and then cell at
+    every level (a counting sort), so the creatures of each bucket in each
+    cell, and in each run of cells in a row, sit next to each other in
+    sorted_agents[level] between cell_start[level][key] and
+    cell_start[level][key + 1], where key is
+    bucket*(cells in the level) + cell. Moving only changes a creature's key, and
+    nothing is re-sorted unless some creature changed cell. Queries see the
+    cells creatures were in when rebuild was last called.
+
+    Creatures that see far can search a coarser level (see level_for), so
+    they look through fewer runs of cells when that doesn't make them look
+    through much more of the board
+    """
+    def __init__(self, num_cells_x, num_cells_y, cell_size, capacity=1024, levels=4, area_slack=1.25):
+        """
+        Initializes an empty hashing grid.
+
+        Args:
+        - num_cells_x (int): Number of level 0 cells in the x-axis.
+        - num_cells_y (int): Number of level 0 cells in the y-axis.
+        - cell_size (int): Size of each level 0 cell.
+        - capacity (int): Number of slots to start with. Grows when needed.
+        - levels (int): Number of cell sizes kept.
+        - area_slack (float): How many times more area than the smallest
+          possible a search can look through at a coarser level, see
+          level_for.
+        """
+        self.shape = (num_cells_y, num_cells_x)
+        self.cell_size = cell_size
+        self.levels = levels
+        self.area_slack = area_slack
+        self.level_shapes = [
+            (-(-num_cells_y >> level), -(-num_cells_x >> level)) for level in range(levels)
+            ]
+
+        # slot information, -1 is an empty slot
+        self.agents = [None] * capacity
+        self.keys = np.full(capacity, -1, dtype=np.int64)
+        self.buckets = np.zeros(capacity, dtype=np.int64)
+        self.free_slots = list(range(capacity - 1, -1, -1))
+
+        # sorted by cell at every level, rebuilt once per frame
+        self.cell_start = [
+            np.zeros(num_buckets*rows*columns + 1, dtype=np.int64) for rows, columns in self.level_shapes
+            ]
+        self.rank = np.zeros((levels, capacity), dtype=np.int64)
+        self.sorted_agents = [[] for level in range(levels)]
+        self.changed = False
+
+        # number of queries and creatures they returned, read and reset by
+        # the profiler (see profiler.py)
+        self.num_queries = 0
+        self.num_candidates = 0
+
+    def level_for(self, radius):
+        """
+        Picks the level to search a radius at. The square searched at a
+        level is 2*cells + 1 of its cells wide, so coarse cells can cover a
+        lot more than the radius. Uses the coarsest level whose square is at
+        most area_slack times the area of the smallest one, which is nearly
+        always level 0. Coarser levels have fewer rows, so fewer runs to
+        look up, but every extra pixel scanned means more candidates to
+        check, which cost more.
+
+        Args:
+        - radius (float): Search distance in pixels, like a view distance.
+
+        Returns:
+        - tuple: (level, cells), the level and the number of its cells the
+          radius reaches in each direction.
+        """
+        cells = [int(np.ceil(radius / (self.cell_size << level))) for level in range(self.levels)]
+        areas = [((2*cells[level] + 1)*(self.cell_size << level))**2 for level in range(self.levels)]
+        smallest = min(areas)
+        level = max(level for level in range(self.levels) if areas[level] <= self.area_slack*smallest)
+        return level, cells[level]
+
+    def cell_of(self, pos, level=0):
+        """
+        Row and column of the cell a position is in, clipped to the grid.
+
+        Args:
+        - pos (numpy.ndarray): (x, y) position.
+        - level (int): Level of the cell.
+
+        Returns:
+        - tuple: (row, column) of the cell.
+        """
+        column = min(max(int(pos[0]/self.cell_size), 0), self.shape[1] - 1)
+        row = min(max(int(pos[1]/self.cell_size), 0), self.shape[0] - 1)
+        return row >> level, column >> level
+
+    def insert(self, creature):
+        """
+        Adds a creature in the cell of its position, in the bucket of its
+        species and sex. It shows up in queries after the next rebuild.
+
+        Args:
+        - creature (Herbivore or Carnivore): The creature to add.
+
+        Returns:
+        - None
+        """
+        if not self.free_slots:
+            old_capacity = len(self.keys)
+            self.agents.extend([None] * old_capacity)
+            self.keys = np.concatenate((self.keys, np.full(old_capacity, -1, dtype=np.int64)))
+            self.buckets = np.concatenate((self.buckets, np.zeros(old_capacity, dtype=np.int64)))
+            self.rank = np.concatenate((self.rank, np.zeros_like(self.rank)), axis=1)
+            self.free_slots = list(range(2*old_capacity - 1, old_capacity - 1, -1))
+
+        slot = self.free_slots.pop()
+        row, column = self.cell_of(creature.pos)
+        creature.hash_slot = slot
+        self.agents[slot] = creature
+        self.keys[slot] = row*self.shape[1] + column
+        self.buckets[slot] = bucket_of(creature.ptype, creature.sex)
+        self.changed = True
+
+    def move(self, creature):
+        """
+        Updates the cell of a creature after it moved. Only marks the grid
+        as needing to be re-sorted if it's in a different cell.
+
+        Args:
+        - creature (Herbivore or Carnivore): The creature that moved.
+
+        Returns:
+        - None
+        """
+        row, column = self.cell_of(creature.pos)
+        key = row*self.shape[1] + column
+        if self.keys[creature.hash_slot] != key:
+            self.keys[creature.hash_slot] = key
+            self.changed = True
+
+    def remove(self, creature):
+        """
+        Takes a creature out of the grid. It stops showing up in queries
+        right away.
+
+        Args:
+        - creature (Herbivore or Carnivore): The creature to remove.
+
+        Returns:
+        - None
+        """
+        slot = creature.hash_slot
+        if self.agents[slot] is not creature:
+            return
+        for level in range(self.levels):
+            sorted_agents = self.sorted_agents[level]
+            rank = self.rank[level, slot]
+            if rank < len(sorted_agents) and sorted_agents[rank] is creature:
+                sorted_agents[rank] = None
+        self.agents[slot] = None
+        self.keys[slot] = -1
+        self.free_slots.append(slot)
+        self.changed = True
+
+    def rebuild(self):
+        """
+        Sorts the creatures by cell at every level. Called once per frame
+        before the creatures are updated. Does nothing if no creature
+        changed cell.
+
+        Args:
+        - None
+
+        Returns:
+        - None
+        """
+        if not self.changed:
+            return
+        used = np.flatnonzero(self.keys >= 0)
+        rows, columns = np.divmod(self.keys[used], self.shape[1])
+        buckets = self.buckets[used]
+        agents = self.agents
+        for level, (level_rows, level_columns) in enumerate(self.level_shapes):
+            keys = (buckets*level_rows + (rows >> level))*level_columns + (columns >> level)
+            cell_start = self.cell_start[level]
+            counts = np.bincount(keys, minlength=len(cell_start) - 1)
+            cell_start[0] = 0
+            np.cumsum(counts, out=cell_start[1:])
+            order = used[np.argsort(keys, kind='stable')]
+            self.rank[level, order] = np.arange(len(order))
+            self.sorted_agents[level] = [agents[slot] for slot in order.tolist()]
+        self.changed = False
+
+    def query_ranges(self, row, column, runs, level=0, buckets=None):
+        """
+        Finds the creatures in the cells of a stencil centered on
+        (row, column). Each run of cells is one contiguous range of
+        sorted_agents[level] per bucket.
+
+        Args:
+        - row (int): Row of the center cell.
+        - column (int): Column of the center cell.
+        - runs (tuple): (dy, dx_start, dx_end) tuples of a stencil.
+        - level (int): Level the row, column and stencil are in.
+        - buckets (tuple): Buckets to look in, from buckets_of. Every
+          bucket if None.
+
+        Returns:
+        - list: (start, end) index ranges into sorted_agents[level].
+        """
+        num_rows, num_columns = self.level_shapes[level]
+        cell_start = self.cell_start[level]
+        if buckets is None:
+            buckets = range(num_buckets)
+        ranges = []
+        for dy, dx_start, dx_end in runs:
+            r = row + dy
+            if r < 0 or r >= num_rows:
+                continue
+            start = max(column + dx_start, 0)
+            end = min(column + dx_end + 1, num_columns)
+            if start < end:
+                for bucket in buckets:
+                    offset = (bucket*num_rows + r)*num_columns
+                    first = cell_start[offset + start]
+                    last = cell_start[offset + end]
+                    if first < last:
+                        ranges.append((first, last))
+        return ranges
+
+    def query(self, row, column, runs, level=0, buckets=None):
+        """
+        Returns the creatures in the cells of a stencil centered on
+        (row, column).
+
+        Args:
+        - row (int): Row of the center cell.
+        - column (int): Column of the center cell.
+        - runs (tuple): (dy, dx_start, dx_end) tuples of a stencil.
+        - level (int): Level the row, column and stencil are in.
+        - buckets (tuple): Buckets to look in, from buckets_of. Every
+          bucket if None.
+
+        Returns:
+        - list: The creatures, in bucket and then cell order.
+        """
+        sorted_agents = self.sorted_agents[level]
+        creatures = []
+        for first, last in self.query_ranges(row, column, runs, level, buckets):
+            creatures.extend(sorted_agents[first:last])
+        if None in creatures:
+            # creatures removed since the last rebuild
+            creatures = [creature for creature in creatures if creature is not None]
+        self.num_queries += 1
+        self.num_candidates += len(creatures)
+        return creatures
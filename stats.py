@@ -0,0 +1,133 @@
+import numpy as np
+import pygame
+
+# Phenotype values that are averaged for the statistics csv file, and the
+# column each one is saved under
+tracked_genes = {
+    'speed': 'speed',
+    'turn_speed': 'turn-speed',
+    'fov': 'fov',
+    'view_dist': 'view-dist',
+    'max_energy': 'max-energy',
+    'metabolism_rate': 'metabolism-rate',
+    'find_mate_rate': 'find-mate-rate',
+    'max_desire_to_mate': 'max-desire-to-mate',
+    }
+
+class Stats_Accumulator:
+    """
+    Keeps the number of creatures of each species and the sum of their
+    tracked gene values. Updated when a creature is born or dies, so the
+    per-frame statistics don't need to loop through every creature
+    """
+    def __init__(self):
+        """
+        Initializes the accumulator with no creatures.
+        """
+        self.counts = {'prey': 0, 'predator': 0}
+        self.sums = {
+            'prey': np.zeros(len(tracked_genes)),
+            'predator': np.zeros(len(tracked_genes))
+            }
+
+    def gene_values(self, creature):
+        """
+        Returns the tracked gene values of a creature.
+
+        Args:
+        - creature (Herbivore or Carnivore): The creature.
+
+        Returns:
+        - numpy.ndarray: Values in the order of tracked_genes.
+        """
+        phenotype = creature.phenotype
+        return np.array([getattr(phenotype, name) for name in tracked_genes])
+
+    def add(self, creature):
+        """
+        Counts a creature that was just born.
+
+        Args:
+        - creature (Herbivore or Carnivore): The creature.
+
+        Returns:
+        - None
+        """
+        self.counts[creature.ptype] += 1
+        self.sums[creature.ptype] += self.gene_values(creature)
+
+    def remove(self, creature):
+        """
+        Uncounts a creature that just died.
+
+        Args:
+        - creature (Herbivore or Carnivore): The creature.
+
+        Returns:
+        - None
+        """
+        self.counts[creature.ptype] -= 1
+        if self.counts[creature.ptype] == 0:
+            # resets to exactly 0 so rounding errors don't build up
+            self.sums[creature.ptype][:] = 0
+        else:
+            self.sums[creature.ptype] -= self.gene_values(creature)
+
+    def averages(self, ptype):
+        """
+        Average of every tracked gene over the creatures of one species.
+
+        Args:
+        - ptype (str): 'prey' or 'predator'.
+
+        Returns:
+        - dict: Average of each gene keyed by its csv column name. All 0 if
+          there are no creatures of that species.
+        """
+        count = self.counts[ptype]
+        if count == 0:
+            return {column: 0 for column in tracked_genes.values()}
+        averages = self.sums[ptype] / count
+        return {column: averages[i] for i, column in enumerate(tracked_genes.values())}
+
+class Creature_Group(pygame.sprite.Group):
+    """
+    Sprite group that keeps a Stats_Accumulator up to date. pygame calls
+    add_internal and remove_internal whenever a sprite joins or leaves the
+    group, including when a creature calls kill. Every creature is also
+    given a uid the first time it's added, in the order they're added, so
+    creatures can be updated in the same order every run
+    """
+    def __init__(self, *sprites):
+        """
+        Initializes the group and its accumulator.
+
+        Args:
+        - sprites (pygame.sprite.Sprite): Sprites to start the group with.
+        """
+        self.stats = Stats_Accumulator()
+        self.next_uid = 0
+        super().__init__(*sprites)
+
+    def add_internal(self, sprite, layer=None):
+        if getattr(sprite, 'uid', None) is None:
+            sprite.uid = self.next_uid
+            self.next_uid += 1
+        super().add_internal(sprite, layer)
+        self.stats.add(sprite)
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        self.stats.remove(sprite)
+
+    def in_order(self):
+        """
+        Every creature in the group, sorted by uid.
+
+        Args:
+        - None
+
+        Returns:
+        - list: The creatures.
+        """
+        return sorted(self.spritedict, key=lambda creature: creature.uid)
@@ -0,0 +1,284 @@
+import argparse
+import csv
+import itertools
+import multiprocessing
+import numpy as np
+import os
+
+from experiments import Experiment_Store, save_time_series
+from simulation import Simulation, default_settings, initial_gene_ranges
+
+# Runs the model headless for many combinations of settings and random
+# seeds at once on a process pool, instead of hand editing constants and
+# running main.py for every experiment. Every run saves its statistics
+# time series to its own csv file, and one row per run is added to a
+# results table with the settings, when a species died out and the final
+# gene averages.
+#
+# Parameters are either names from simulation.default_settings, like
+# prey-maturity or hunt-threshold, or initial gene ranges written as
+# species:gene, like prey:speed, whose values are (low, high) tuples.
+#
+# With an Experiment_Store (see experiments.py) runs that already finished
+# with the same configuration, seed and code are read from the store
+# instead of run again, so a sweep that was interrupted can just be
+# started again.
+
+dt = 0.025
+
+def grid_points(space):
+    """
+    Every combination of the values of every parameter.
+
+    Args:
+    - space (dict): List of values for each parameter.
+
+    Returns:
+    - list: One dict of parameter values per combination.
+    """
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*space.values())]
+
+def random_points(space, n, seed=0):
+    """
+    Random combinations of parameter values. Numbers are picked uniformly
+    between (low, high), anything given as a list has one of its values
+    picked.
+
+    Args:
+    - space (dict): (low, high) or list of values for each parameter.
+    - n (int): Number of combinations.
+    - seed (int): Seed for picking the values.
+
+    Returns:
+    - list: One dict of parameter values per combination.
+    """
+    random = np.random.RandomState(seed)
+    points = []
+    for i in range(n):
+        point = {}
+        for name, values in space.items():
+            if isinstance(values, list):
+                point[name] = values[random.randint(len(values))]
+            else:
+                low, high = values
+                point[name] = float(random.uniform(low, high))
+        points.append(point)
+    return points
+
+def split_point(point):
+    """
+    Splits a combination of parameter values into Simulation settings and
+    gene ranges.
+
+    Args:
+    - point (dict): Parameter values.
+
+    Returns:
+    - tuple: (settings, gene_ranges) for Simulation.
+    """
+    settings = {}
+    gene_ranges = {}
+    for name, value in point.items():
+        if ':' in name:
+            ptype, gene = name.split(':')
+            if ptype not in initial_gene_ranges or gene not in initial_gene_ranges[ptype]:
+                raise KeyError('Unknown gene range ' + name)
+            gene_ranges.setdefault(ptype, {})[gene] = tuple(value)
+        else:
+            if name not in default_settings:
+                raise KeyError('Unknown setting ' + name)
+            if isinstance(default_settings[name], int):
+                value = int(round(value)) # counts and ages sampled as floats
+            settings[name] = value
+    return settings, gene_ranges
+
+def full_config(point, ticks):
+    """
+    Everything a run depends on besides its seed and the code: every
+    setting and gene range, including the defaults, plus the frames and
+    time step.
+
+    Args:
+    - point (dict): Parameter values.
+    - ticks (int): Most frames the run can go for.
+
+    Returns:
+    - dict: The configuration, made of things json can save.
+    """
+    settings, gene_ranges = split_point(point)
+    return {
+        'settings': dict(default_settings, **settings),
+        'gene_ranges': {
+            ptype: {gene: list(value) for gene, value in dict(ranges, **gene_ranges.get(ptype, {})).items()}
+            for ptype, ranges in initial_gene_ranges.items()
+            },
+        'ticks': ticks,
+        'dt': dt,
+        }
+
+def run_one(task):
+    """
+    Runs the model once with one combination of parameter values and one
+    seed. Called in the worker processes.
+
+    Args:
+    - task (tuple): (run, point, seed, ticks, output, key, series) where
+      run is the number of the run and output is the folder files are
+      saved in. With a store, key is the key of the run and series is
+      where its .npz time series is saved, otherwise both are None.
+
+    Returns:
+    - dict: Row of the results table.
+    """
+    run, point, seed, ticks, output, key, series = task
+    settings, gene_ranges = split_point(point)
+
+    if series is None:
+        location = os.path.join(output, 'run-{}.csv'.format(run))
+    else:
+        location = series + '.csv'
+    simulation = Simulation(
+        headless=True, location=location, death_location=os.devnull,
+        settings=settings, gene_ranges=gene_ranges, seed=seed
+        )
+    ticks_run = simulation.run(dt, ticks)
+    simulation.close()
+
+    stats = simulation.creature_group.stats
+    row = {'run': run, 'seed': seed}
+    row.update(settings)
+    for ptype, ranges in gene_ranges.items():
+        for gene, value in ranges.items():
+            row[ptype + ':' + gene] = '{}:{}'.format(*value)
+    row['ticks'] = ticks_run
+    row['extinct'] = simulation.extinct()
+    row['extinction-time'] = simulation.t if simulation.extinct() else ''
+    row['final-num-prey'] = stats.counts['prey']
+    row['final-num-predators'] = stats.counts['predator']
+    for ptype in ('prey', 'predator'):
+        for column, value in stats.averages(ptype).items():
+            row[ptype + '-' + column] = value
+    row['time-series'] = location
+    if series is not None:
+        save_time_series(location, series)
+        row['time-series'] = series
+        row['key'] = key
+    return row
+
+def sweep(points, seeds=1, ticks=5000, output='sweep', processes=None, store=None):
+    """
+    Runs every combination of parameter values with every seed on a process
+    pool and writes the results table to output/results.csv, one row per
+    run in the order the runs finish. Runs already in store come first and
+    aren't run again.
+
+    Args:
+    - points (list): Parameter values of each combination, from
+      grid_points or random_points.
+    - seeds (int): Number of seeds each combination is run with.
+    - ticks (int): Most frames each run can go for.
+    - output (str): Folder the results and time series are saved in.
+    - processes (int): Number of worker processes. Defaults to the number
+      of cores.
+    - store (Experiment_Store): Optional store to look up and save runs in.
+
+    Returns:
+    - list: The rows of the results table.
+    """
+    os.makedirs(output, exist_ok=True)
+    tasks = []
+    cached = []
+    for run, (point, seed) in enumerate(itertools.product(points, range(seeds))):
+        if store is None:
+            tasks.append((run, point, seed, ticks, output, None, None))
+            continue
+        config = full_config(point, ticks)
+        key = store.key(config, seed)
+        if store.is_done(key):
+            row = store.summary(key)
+            row['run'] = run
+            cached.append(row)
+        else:
+            store.start(key, config, seed)
+            tasks.append((run, point, seed, ticks, output, key, store.series_location(key)))
+
+    rows = []
+    total = len(cached) + len(tasks)
+    with open(os.path.join(output, 'results.csv'), 'w', newline='') as file:
+        writer = None
+
+        def add_row(row):
+            nonlocal writer
+            if writer is None:
+                writer = csv.DictWriter(file, fieldnames=list(row), extrasaction='ignore')
+                writer.writeheader()
+            writer.writerow(row)
+            file.flush()
+            rows.append(row)
+
+        for row in cached:
+            add_row(row)
+        if cached:
+            print('Found {} of {} runs in the store'.format(len(cached), total))
+
+        if tasks:
+            with multiprocessing.Pool(processes) as pool:
+                for row in pool.imap_unordered(run_one, tasks):
+                    if store is not None:
+                        store.finish(row['key'], row)
+                    add_row(row)
+                    print('Finished run {} of {}'.format(len(rows), total))
+    return rows
+
+def parse_values(text):
+    """
+    Reads the values of one parameter from the command line. Numbers are
+    separated by commas, gene ranges by semicolons with low:high each.
+
+    Args:
+    - text (str): For example '25,50,100' or '50:150;80:200'.
+
+    Returns:
+    - list: The values.
+    """
+    if ':' in text:
+        return [tuple(float(x) for x in part.split(':')) for part in text.split(';')]
+    return [float(x) if '.' in x else int(x) for x in text.split(',')]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Runs the model for many settings and seeds')
+    parser.add_argument('parameters', nargs='+',
+                        help='name=values, for example prey-maturity=25,50,100 or prey:speed=50:150;80:200')
+    parser.add_argument('--random', type=int, default=None,
+                        help='pick this many random combinations between the first and last value of each parameter instead of every combination')
+    parser.add_argument('--seeds', type=int, default=1,
+                        help='number of seeds each combination is run with')
+    parser.add_argument('--ticks', type=int, default=5000,
+                        help='most frames each run can go for')
+    parser.add_argument('--output', default='sweep',
+                        help='folder the results table and time series are saved in')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='number of worker processes (default: number of cores)')
+    parser.add_argument('--store', default=None,
+                        help='folder of an experiment store to skip finished runs and save new ones in')
+    args = parser.parse_args()
+
+    space = {}
+    for parameter in args.parameters:
+        name, text = parameter.split('=')
+        space[name] = parse_values(text)
+
+    if args.random is None:
+        points = grid_points(space)
+    else:
+        # numbers are sampled between their lowest and highest value,
+        # gene ranges are picked from the ones given
+        space = {
+            name: values if isinstance(values[0], tuple) else (min(values), max(values))
+            for name, values in space.items()
+            }
+        points = random_points(space, args.random)
+
+    store = None if args.store is None else Experiment_Store(args.store)
+    sweep(points, args.seeds, args.ticks, args.output, args.processes, store)